@@ -1,14 +1,23 @@
 """Main file to run the Dash app."""
 
+import hmac
+import json
+import os
+from functools import partial
+
 import dash_mantine_components as dmc
+import flask
 from dash import (
     ALL,
+    ClientsideFunction,
     Dash,
     Input,
     Output,
+    Patch,
     State,
     _dash_renderer,
     callback,
+    clientside_callback,
     ctx,
     no_update,
 )
@@ -16,19 +25,96 @@ from dash.exceptions import PreventUpdate
 
 from . import utility as utils
 from .data_loader import (
-    NATIONAL_SAMPLE_SIZE,
+    DATA_DICTIONARIES,
+    DOMAIN_TEXT,
     PRERENDERED_BARPLOTS,
-    SURVEY_DATA,
+    PRERENDERED_DESCRIPTIVE_PLOTS,
+    PRERENDERED_SINGLE_BARPLOTS,
+    get_prerendered_figure,
 )
+from .figure_cache import FigureCache
+from .instrumentation import register_instrumentation
 from .layout import MAP_LAYOUT, SINGLE_SUBQUESTION_FIG_KW, construct_layout
-from .make_descriptive_plots import make_descriptive_plots
+from .make_descriptive_plots import (
+    get_descriptive_plot_trace_data,
+    make_descriptive_plots,
+)
 from .make_map import make_map
 from .make_stacked_bar_plots import make_stacked_bar
+from .metrics import generate_metrics, record_figure_lookup
+from .profiling import get_profiling_status, request_profiles
+from .response_cache import PrecompressedResponseCache
+from .tracing import span, traced
 from .utility import (  # IMPACT_COLORMAP,; OPINION_COLORMAP,
-    ALL_STATES_LABEL,
     DEFAULT_QUESTION,
     NUM_DECIMALS,
-    SECTION_TITLES,
+)
+
+# Upper bound on the total serialized size of the selected-question bar plots kept in memory (per worker process)
+SELECTED_QUESTION_CACHE_MAX_BYTES = (
+    int(os.environ.get("SELECTED_QUESTION_CACHE_MAX_MB", 64)) * 1024**2
+)
+# Upper bound on the total serialized size of the maps kept in memory (per worker process)
+MAP_CACHE_MAX_BYTES = int(os.environ.get("MAP_CACHE_MAX_MB", 32)) * 1024**2
+# Whether to render the most commonly viewed selected-question bar plots when the app starts.
+# NOTE: When running gunicorn with --preload, this happens once before the workers are forked.
+SELECTED_QUESTION_CACHE_WARMUP = (
+    os.environ.get("SELECTED_QUESTION_CACHE_WARMUP", "false").lower() == "true"
+)
+
+# How to update the sample descriptive plot when a state is selected:
+# - "figure": send the whole (prerendered) figure
+# - "patch": only send the bar data, since the layout of the figure is the same for every state
+DESCRIPTIVE_PLOT_UPDATE_MODE = os.environ.get(
+    "DESCRIPTIVE_PLOT_UPDATE_MODE", "figure"
+)
+
+# Maximum number of figures memoized in the browser (0 to disable), see assets/clientside.js
+FIGURE_MEMO_MAX_ENTRIES = int(os.environ.get("FIGURE_MEMO_MAX_ENTRIES", 50))
+
+# Whether to prefetch the figures for a state into the browser's figure memo when it is hovered on the map
+# for at least PREFETCH_DWELL_MS (opt-in since most prefetched figures are never shown)
+PREFETCH_ON_HOVER = (
+    os.environ.get("PREFETCH_ON_HOVER", "false").lower() == "true"
+)
+PREFETCH_DWELL_MS = int(os.environ.get("PREFETCH_DWELL_MS", 300))
+PREFETCH_ROUTE = "/prefetch-figures"
+
+# Names of the figures memoized in the browser (see getFigureMemoKeys in assets/clientside.js)
+FIGURE_MEMO_OUTPUTS = {"descriptive", "map", "selected", "stacked"}
+# Figures that can be prefetched, since they are prerendered or cached on the server
+# (or, for the map of the hovered state, quick to render into its bounded cache)
+PREFETCHED_OUTPUTS = {"descriptive", "map", "selected", "stacked"}
+
+# Outputs that are only updated once the map and selected question bar plot have been sent,
+# since they are below the fold (stacked bar plots) or in the drawer (descriptive plot)
+DEFERRED_OUTPUTS = {"descriptive", "stacked"}
+
+# Whether to compress responses (requires flask-compress, installed with dash[compress])
+COMPRESS_RESPONSES = (
+    os.environ.get("COMPRESS_RESPONSES", "true").lower() == "true"
+)
+# Upper bound on the total size of the compressed callback responses kept in memory (per worker process)
+PRECOMPRESSED_RESPONSE_CACHE_MAX_BYTES = (
+    int(os.environ.get("PRECOMPRESSED_RESPONSE_CACHE_MAX_MB", 64)) * 1024**2
+)
+
+# Token required to use the admin routes (/admin/profile and /cache-stats), which are disabled if it is not set.
+# PROFILE_ADMIN_TOKEN, its name from when it only guarded /admin/profile, is still accepted if ADMIN_TOKEN is not set.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") or os.environ.get(
+    "PROFILE_ADMIN_TOKEN"
+)
+
+SELECTED_QUESTION_FIGURE_CACHE = FigureCache(
+    max_bytes=SELECTED_QUESTION_CACHE_MAX_BYTES,
+    on_lookup=partial(record_figure_lookup, "selected_question_cache"),
+)
+MAP_FIGURE_CACHE = FigureCache(
+    max_bytes=MAP_CACHE_MAX_BYTES,
+    on_lookup=partial(record_figure_lookup, "map_cache"),
+)
+PRECOMPRESSED_RESPONSE_CACHE = PrecompressedResponseCache(
+    max_bytes=PRECOMPRESSED_RESPONSE_CACHE_MAX_BYTES
 )
 
 # Currently needed by DMC, https://www.dash-mantine-components.com/getting-started#simple-usage
@@ -40,6 +126,9 @@ app = Dash(
     external_stylesheets=[
         "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css"
     ],
+    compress=COMPRESS_RESPONSES,
+    # Only used by the static export of the dashboard (see code/export_static_site.py)
+    assets_ignore=r"static_export\.js",
 )
 
 # Plausible analytics script (see also https://dash.plotly.com/external-resources#usage)
@@ -64,12 +153,406 @@ app.index_string = """
 </html>
 """
 
-app.layout = dmc.MantineProvider(construct_layout(), forceColorScheme="light")
+app.layout = dmc.MantineProvider(
+    construct_layout(
+        figure_memo_max_entries=FIGURE_MEMO_MAX_ENTRIES,
+        prefetch_url=PREFETCH_ROUTE if PREFETCH_ON_HOVER else None,
+        prefetch_dwell_ms=PREFETCH_DWELL_MS,
+    ),
+    forceColorScheme="light",
+)
 
 server = app.server
 
+register_instrumentation(
+    app,
+    response_cache=PRECOMPRESSED_RESPONSE_CACHE,
+    compress_responses=COMPRESS_RESPONSES,
+)
 
-@callback(
+
+@traced
+def get_selected_question_bar_plot(
+    question: str,
+    subquestion: str,
+    state: str | None,
+    stratify: bool,
+    threshold: str | None,
+):
+    """
+    Return the stacked bar plot for the selected question.
+    Prerendered figures are used when available, otherwise the figure is rendered (and cached) on demand.
+    """
+    figure = get_prerendered_figure(
+        PRERENDERED_SINGLE_BARPLOTS,
+        (question, subquestion, state, stratify, threshold, NUM_DECIMALS),
+    )
+    record_figure_lookup("prerendered_single", hit=figure is not None)
+    if figure is not None:
+        return figure
+
+    def render() -> str:
+        with span("make_stacked_bar"):
+            figure = make_stacked_bar(
+                question=question,
+                subquestion=subquestion,
+                state=state,
+                stratify=stratify,
+                threshold=threshold,
+                decimals=NUM_DECIMALS,
+                fig_kw=SINGLE_SUBQUESTION_FIG_KW,
+            )
+        with span("serialize_figure"):
+            return figure.to_json()
+
+    figure_json = SELECTED_QUESTION_FIGURE_CACHE.get_or_render(
+        key=(question, subquestion, state, stratify, threshold),
+        render=render,
+    )
+    return json.loads(figure_json)
+
+
+def warm_up_selected_question_cache():
+    """
+    Render the selected-question bar plots for the most common combinations of inputs,
+    i.e. national results at the default threshold, with and without party stratification.
+    """
+    subquestions_df = DATA_DICTIONARIES["subquestion_dictionary.tsv"]
+    for question, subquestion in zip(
+        subquestions_df["question"], subquestions_df["sub_question"]
+    ):
+        for stratify in [False, True]:
+            get_selected_question_bar_plot(
+                question=question,
+                subquestion=subquestion,
+                state=None,
+                stratify=stratify,
+                threshold=DEFAULT_QUESTION["outcome"],
+            )
+    # Only count lookups made by actual users
+    SELECTED_QUESTION_FIGURE_CACHE.reset_stats()
+
+
+if SELECTED_QUESTION_CACHE_WARMUP:
+    warm_up_selected_question_cache()
+
+
+def get_sample_descriptive_plot(state: str | None):
+    """Look up the prerendered sample descriptive plot for a state, falling back to rendering it live."""
+    figure = get_prerendered_figure(
+        PRERENDERED_DESCRIPTIVE_PLOTS, (state, NUM_DECIMALS)
+    )
+    record_figure_lookup("prerendered_descriptive", hit=figure is not None)
+    if figure is None:
+        with span("make_descriptive_plots"):
+            figure = make_descriptive_plots(
+                state=state,
+                decimals=NUM_DECIMALS,
+            )
+    return figure
+
+
+@traced
+def make_descriptive_plot_patch(state: str | None) -> Patch:
+    """
+    Create a partial update of the sample descriptive plot that only replaces the data arrays of the bar traces,
+    leaving the subplot layout already in the browser untouched.
+    """
+    with span("get_descriptive_plot_trace_data"):
+        traces_data = get_descriptive_plot_trace_data(state)
+    patched_figure = Patch()
+    for trace_idx, trace_data in enumerate(traces_data):
+        for prop, values in trace_data.items():
+            patched_figure["data"][trace_idx][prop] = values
+    return patched_figure
+
+
+@traced
+def get_map(
+    question: str, subquestion: str, state: str | None, impact: str | None
+):
+    """
+    Return the map with the opinion data for a question at the set default threshold, or with the impact data if an impact is selected.
+    The map is rendered (and cached) on demand.
+    """
+
+    def render() -> str:
+        with span("make_map", impact=impact):
+            figure = make_map(
+                question=question,
+                sub_question=subquestion,
+                outcome=DEFAULT_QUESTION["outcome"],
+                clicked_state=state,
+                impact=impact,
+                colormap_range_padding=MAP_LAYOUT["colormap_range_padding"],
+                margins=MAP_LAYOUT["margin"],
+                decimals=NUM_DECIMALS,
+                # opinion_colormap=OPINION_COLORMAP,
+                # impact_colormap=IMPACT_COLORMAP,
+            )
+        with span("serialize_figure"):
+            return figure.to_json()
+
+    figure_json = MAP_FIGURE_CACHE.get_or_render(
+        key=(question, subquestion, state, impact),
+        render=render,
+    )
+    return json.loads(figure_json)
+
+
+@traced
+def get_stacked_bar_plots(
+    state: str | None,
+    stratify: bool,
+    threshold: str | None,
+    active_domain: str,
+    rendered_keys: dict,
+    outputs_list: list[dict],
+) -> tuple[list, dict]:
+    """
+    Look up the prerendered stacked bar plots (for all subquestions) of the questions in the outputs list.
+
+    Only the plots in the active domain tab are updated (and only if they are out of date),
+    the plots in the other tabs are left as is until their tab is activated.
+
+    Returns
+    -------
+    tuple[list, dict]
+        The figures (or no_update) for each output,
+        and the updated keys of the stacked bar plots shown in each domain tab.
+    """
+    key = utils.get_stacked_bar_plot_key(state, stratify, threshold)
+    if rendered_keys.get(active_domain) == key:
+        return [no_update] * len(outputs_list), no_update
+
+    figure_lookup_key = (
+        state,
+        stratify,
+        threshold,
+        NUM_DECIMALS,
+    )
+    record_figure_lookup(
+        "prerendered_stacked", hit=figure_lookup_key in PRERENDERED_BARPLOTS
+    )
+
+    figures = []
+    for output in outputs_list:
+        # Example: {'id': {'domain': 'Climate emotions', 'question': 'q2', 'type': 'stacked-bar-plot'}, 'property': 'figure'}
+        if output["id"]["domain"] != active_domain:
+            figures.append(no_update)
+            continue
+        question = output["id"]["question"]
+        figures.append(
+            json.loads(PRERENDERED_BARPLOTS[figure_lookup_key][question])
+        )
+
+    return figures, {**rendered_keys, active_domain: key}
+
+
+@traced
+def get_domain_stacked_bar_plots(
+    state: str | None,
+    stratify: bool,
+    threshold: str | None,
+    domain: str,
+) -> dict:
+    """Look up the prerendered stacked bar plots (for all subquestions) of the questions in a domain."""
+    questions_df = DATA_DICTIONARIES["question_dictionary.tsv"]
+    figure_lookup_key = (state, stratify, threshold, NUM_DECIMALS)
+    record_figure_lookup(
+        "prerendered_stacked", hit=figure_lookup_key in PRERENDERED_BARPLOTS
+    )
+    figures = PRERENDERED_BARPLOTS[figure_lookup_key]
+    return {
+        question: json.loads(figures[question])
+        for question in questions_df.loc[
+            questions_df["domain_text"] == domain, "question"
+        ]
+    }
+
+
+# The states, question dropdown values and impacts that can be selected (as in the lookup-tables store, see layout.py)
+SELECTABLE_STATES = set(utils.get_sample_sizes())
+SELECTABLE_QUESTION_VALUES = {
+    f"{question}_{subquestion}"
+    for question, subquestion in zip(
+        DATA_DICTIONARIES["subquestion_dictionary.tsv"]["question"],
+        DATA_DICTIONARIES["subquestion_dictionary.tsv"]["sub_question"],
+    )
+}
+SELECTABLE_IMPACTS = {option["value"] for option in utils.get_impact_options()}
+
+
+def is_valid_prefetch_request(selection) -> bool:
+    """Check that a prefetch request is for a known state, question, impact and domain and only asks for known figures."""
+    if not isinstance(selection, dict):
+        return False
+    state = selection.get("state")
+    question_value = selection.get("question_value")
+    impact = selection.get("impact")
+    outputs = selection.get("outputs")
+    return (
+        (
+            state is None
+            or isinstance(state, str)
+            and state in SELECTABLE_STATES
+        )
+        and isinstance(question_value, str)
+        and question_value in SELECTABLE_QUESTION_VALUES
+        and (
+            impact is None
+            or isinstance(impact, str)
+            and impact in SELECTABLE_IMPACTS
+        )
+        and isinstance(selection.get("stratify"), bool)
+        and isinstance(selection.get("show_all"), bool)
+        and isinstance(selection.get("domain"), str)
+        and selection["domain"] in DOMAIN_TEXT.values()
+        and isinstance(outputs, dict)
+        and set(outputs) <= FIGURE_MEMO_OUTPUTS
+        and all(isinstance(key, str) for key in outputs.values())
+    )
+
+
+def get_prefetched_figure(
+    name: str,
+    state: str | None,
+    question: str,
+    subquestion: str,
+    impact: str | None,
+    stratify: bool,
+    threshold: str | None,
+    domain: str,
+):
+    """
+    Look up a figure to prefetch among the prerendered and cached figures, returning None if it would need rendering.
+    The map is the exception, since it is quick to render and the map cache is bounded.
+    """
+    if name == "descriptive":
+        return get_prerendered_figure(
+            PRERENDERED_DESCRIPTIVE_PLOTS, (state, NUM_DECIMALS)
+        )
+    if name == "map":
+        return get_map(question, subquestion, state, impact)
+    if name == "selected":
+        figure = get_prerendered_figure(
+            PRERENDERED_SINGLE_BARPLOTS,
+            (question, subquestion, state, stratify, threshold, NUM_DECIMALS),
+        )
+        if figure is None:
+            figure_json = SELECTED_QUESTION_FIGURE_CACHE.peek(
+                (question, subquestion, state, stratify, threshold)
+            )
+            figure = json.loads(figure_json) if figure_json else None
+        return figure
+    if name == "stacked":
+        figures = PRERENDERED_BARPLOTS.get(
+            (state, stratify, threshold, NUM_DECIMALS)
+        )
+        if figures is None:
+            return None
+        questions_df = DATA_DICTIONARIES["question_dictionary.tsv"]
+        return {
+            question: json.loads(figures[question])
+            for question in questions_df.loc[
+                questions_df["domain_text"] == domain, "question"
+            ]
+        }
+    raise ValueError(f"Figure {name!r} cannot be prefetched")
+
+
+def prefetch_figures():
+    """
+    Return the figures requested by the browser to prefetch into its figure memo, keyed on their memo keys.
+
+    The request has the same format as the selection-request store (see requestSelectionDependentOutputs
+    and prefetchHoveredState in assets/clientside.js). Apart from the map (see get_prefetched_figure),
+    only figures that are prerendered or cached are returned, so that prefetches (most of which are never shown)
+    do not use up rendering time.
+    """
+    selection = flask.request.get_json(silent=True)
+    if not is_valid_prefetch_request(selection):
+        flask.abort(400)
+    question, subquestion = utils.extract_question_subquestion(
+        selection["question_value"]
+    )
+
+    figures = {}
+    for name, key in selection["outputs"].items():
+        if name not in PREFETCHED_OUTPUTS:
+            continue
+        figure = get_prefetched_figure(
+            name,
+            state=selection["state"],
+            question=question,
+            subquestion=subquestion,
+            impact=selection["impact"],
+            stratify=selection["stratify"],
+            threshold=utils.get_threshold(selection["show_all"]),
+            domain=selection["domain"],
+        )
+        if figure is not None:
+            figures[key] = figure
+
+    return flask.Response(json.dumps(figures), mimetype="application/json")
+
+
+if PREFETCH_ON_HOVER:
+    server.add_url_rule(
+        PREFETCH_ROUTE, view_func=prefetch_figures, methods=["POST"]
+    )
+
+
+def require_admin_token():
+    """Abort the request unless it has the admin token (as a bearer token), or if there is no admin token."""
+    if ADMIN_TOKEN is None:
+        flask.abort(404)
+    if not hmac.compare_digest(
+        flask.request.headers.get("Authorization", ""), f"Bearer {ADMIN_TOKEN}"
+    ):
+        flask.abort(403)
+
+
+@server.route("/metrics")
+def metrics():
+    """Expose the metrics of the callbacks and figure lookups in the Prometheus text format."""
+    body, content_type = generate_metrics()
+    return flask.Response(body, content_type=content_type)
+
+
+@server.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """
+    Report the profiling status (GET) or profile the next callback requests of the worker process
+    that handles the request (POST, with optional `count` and comma-separated `callbacks` query parameters).
+    """
+    require_admin_token()
+    if flask.request.method == "POST":
+        callbacks = flask.request.args.get("callbacks", "")
+        request_profiles(
+            count=flask.request.args.get("count", 1, type=int),
+            callbacks={name for name in callbacks.split(",") if name},
+        )
+    return get_profiling_status()
+
+
+@server.route("/cache-stats")
+def cache_stats():
+    """Report usage statistics of the in-memory figure and response caches (for the current worker process)."""
+    require_admin_token()
+    return {
+        "selected_question_bar_plot": SELECTED_QUESTION_FIGURE_CACHE.stats(),
+        "map": MAP_FIGURE_CACHE.stats(),
+        "precompressed_responses": PRECOMPRESSED_RESPONSE_CACHE.stats(),
+    }
+
+
+# NOTE: This only depends on its inputs, so it runs in the browser to save a server round trip
+# on every state selection and party switch toggle
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="updateStateSelection"
+    ),
     [
         Output("state-select", "value"),
         Output("state-select", "disabled"),
@@ -83,275 +566,305 @@ server = app.server
     ],
     prevent_initial_call=True,
 )
-def update_state_and_disable_state_select_and_party_switch_interaction(
-    figure, is_party_stratify_checked, selected_state
-):
-    """
-    Update the state dropdown when a specific state is clicked (if party stratify switch is not checked),
-    disable the state dropdown when the party stratify switch is checked,
-    and disable the party stratify switch when a specific state is selected (i.e., not None).
-    """
-    if ctx.triggered_id == "us-map":
-        if is_party_stratify_checked:
-            raise PreventUpdate
-
-        point = figure["points"][0]
-
-        # TODO: This is a temporary fix to handle the edge case where the exact same point (coords)
-        # on the map is selected twice, in which case the customdata key is for some reason missing
-        # from the clickData of the second click.
-        # This workaround assumes that this can only happen in cases where the clicked state is
-        # the same as the currently selected state, and thus will deselect the state in this case.
-        if "customdata" not in point:
-            return None, no_update, False, False
-
-        map_selected_state = point["customdata"][0]
-        if map_selected_state == selected_state:
-            return None, no_update, False, False
-        return (
-            map_selected_state,
-            no_update,
-            False,
-            True,
-        )
-    if ctx.triggered_id == "party-stratify-switch":
-        # Deselect any state
-        return None, is_party_stratify_checked, no_update, no_update
 
-    if selected_state is not None:
-        return no_update, no_update, False, True
-    return no_update, no_update, False, False
-
-
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="toggleDrawer"),
     Output("drawer", "opened"),
     Input("drawer-button", "n_clicks"),
     State("drawer", "opened"),
     prevent_initial_call=True,
 )
-def drawer_toggle(n_clicks, opened):
-    """Callback function for toggling drawer visibility."""
-    return not opened
-
-
-@callback(
-    Output("drawer-state", "children"),
-    Input("state-select", "value"),
-)
-def update_drawer_state(value):
-    """Callback function for updating the state in the drawer."""
-    if value is None:
-        return ALL_STATES_LABEL
-    return f"State: {value}"
-
-
-@callback(
-    Output("drawer-sample-size", "children"),
-    [Input("state-select", "value")],
-)
-def update_drawer_sample_size(value):
-    """Callback function for updating the sample size in the drawer."""
-    df = SURVEY_DATA["samplesizes_state.tsv"]
-    if value is None:
-        sample_size = NATIONAL_SAMPLE_SIZE
-    else:
-        sample_size = df[df["state"] == value]["n"].values[0]
-    return f"Sample size: {sample_size:,}"
-
 
-@callback(
-    Output("sample-descriptive-plot", "figure"),
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="updateStateTexts"
+    ),
+    [
+        Output("drawer-state", "children"),
+        Output("drawer-sample-size", "children"),
+        Output("selected-question-title", "children"),
+        Output("all-questions-title", "children"),
+    ],
     Input("state-select", "value"),
+    State("lookup-tables", "data"),
     prevent_initial_call=True,
 )
-def update_sample_descriptive_plot(state):
-    """Update the sample descriptive plot based on the selected state."""
-    return make_descriptive_plots(
-        state=state,
-        decimals=NUM_DECIMALS,
-    )
 
-
-@callback(
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="resetImpactSelect"
+    ),
     Output("impact-select", "value"),
     Input("question-select", "value"),
     prevent_initial_call=True,
 )
-def reset_impact_select(question_value):
-    """Reset the impact select dropdown when a new question is selected."""
-    return None
-
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="updateMapTitle"),
     Output("map-title", "children"),
     Input("impact-select", "value"),
-    State("impact-select", "data"),
+    [
+        State("impact-select", "data"),
+        State("lookup-tables", "data"),
+    ],
     prevent_initial_call=True,
 )
-def update_map_title(impact, options):
-    """Update the map title when a specific impact is selected (or if the selection is cleared)."""
-    label = next(
-        (option["label"] for option in options if option["value"] == impact),
-        None,
-    )
-    return utils.create_map_title(label)
-
 
-@callback(
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="updateMapSubtitle"
+    ),
     Output("map-subtitle", "children"),
     [
         Input("question-select", "value"),
         Input("impact-select", "value"),
     ],
+    State("lookup-tables", "data"),
     prevent_initial_call=True,
 )
-def update_map_subtitle(question_value, impact):
-    """Update the map subtitle based on the selected question and whether an impact is selected."""
-    if impact is not None:
-        return ""
 
-    question, subquestion = utils.extract_question_subquestion(question_value)
-    return utils.create_question_subtitle(question, subquestion)
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside",
+        function_name="toggleSelectedQuestionBarPlotVisibility",
+    ),
+    Output("selected-question-container", "display"),
+    Input("impact-select", "value"),
+    prevent_initial_call=True,
+)
 
 
-@callback(
-    Output("us-map", "figure"),
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside",
+        function_name="requestSelectionDependentOutputs",
+    ),
+    [
+        Output("sample-descriptive-plot", "figure", allow_duplicate=True),
+        Output("us-map", "figure", allow_duplicate=True),
+        Output("selected-question-bar-plot", "figure", allow_duplicate=True),
+        Output(
+            {"type": "stacked-bar-plot", "domain": ALL, "question": ALL},
+            "figure",
+            allow_duplicate=True,
+        ),
+        Output("stacked-bar-plot-keys", "data", allow_duplicate=True),
+        Output("selection-request", "data"),
+        Output("deferred-selection-request", "data", allow_duplicate=True),
+    ],
     [
-        Input("question-select", "value"),
         Input("state-select", "value"),
+        Input("question-select", "value"),
         Input("impact-select", "value"),
+        Input("party-stratify-switch", "checked"),
+        Input("response-threshold-control", "checked"),
+        Input("domain-tabs", "value"),
+    ],
+    [
+        State(
+            {"type": "stacked-bar-plot", "domain": ALL, "question": ALL}, "id"
+        ),
+        State("stacked-bar-plot-keys", "data"),
+        State("figure-memo-config", "data"),
     ],
     prevent_initial_call=True,
 )
-def update_map(question_value, state, impact):
-    """
-    Update the map with the opinion data for the selected question (value encodes a question-subquestion pairing)
-    at the set default threshold.
-
-    Also updates the map with the impact data if a specific impact is selected.
-    """
-    question, subquestion = utils.extract_question_subquestion(question_value)
-
-    return make_map(
-        question=question,
-        sub_question=subquestion,
-        outcome=DEFAULT_QUESTION["outcome"],
-        clicked_state=state,
-        impact=impact,
-        colormap_range_padding=MAP_LAYOUT["colormap_range_padding"],
-        margins=MAP_LAYOUT["margin"],
-        decimals=NUM_DECIMALS,
-        # opinion_colormap=OPINION_COLORMAP,
-        # impact_colormap=IMPACT_COLORMAP,
-    )
 
 
 @callback(
-    Output("selected-question-bar-plot", "figure"),
     [
-        Input("question-select", "value"),
-        Input("state-select", "value"),
-        Input("party-stratify-switch", "checked"),
-        Input("response-threshold-control", "checked"),
+        Output("us-map", "figure"),
+        Output("selected-question-bar-plot", "figure"),
+        Output("figure-memo-keys", "data"),
+        Output("deferred-selection-request", "data"),
     ],
+    Input("selection-request", "data"),
     prevent_initial_call=True,
 )
-def update_selected_question_bar_plot(
-    question_value,
-    state,
-    is_party_stratify_checked,
-    show_all_responses_checked,
-):
-    """Update the stacked bar plot for the selected question based on the selected criteria."""
-    question, subquestion = utils.extract_question_subquestion(question_value)
-
-    if show_all_responses_checked:
-        threshold = None
-    elif not show_all_responses_checked:
-        threshold = DEFAULT_QUESTION["outcome"]
-
-    figure = make_stacked_bar(
-        question=question,
-        subquestion=subquestion,
-        state=state,
-        stratify=is_party_stratify_checked,
-        threshold=threshold,
-        decimals=NUM_DECIMALS,
-        fig_kw=SINGLE_SUBQUESTION_FIG_KW,
+@traced
+def update_selection_dependent_outputs(request):
+    """
+    Update the components that depend on the selected state, question, impact and bar chart options,
+    only recomputing the outputs affected by the inputs that changed.
+
+    The outputs to recompute are decided in the browser (requestSelectionDependentOutputs in assets/clientside.js),
+    which only sends a request for the ones not already memoized there:
+    - The descriptive plot depends on the state.
+    - The map depends on the question, state and impact.
+    - The selected question bar plot depends on the question, state and bar chart options.
+    - The stacked bar plots for all questions depend on the state and bar chart options,
+      but only those in the visible domain tab are updated (the other tabs are updated when activated).
+
+    The map and selected question bar plot are what the user is looking at, so they are sent first.
+    The other requested outputs, which are below the fold or in the (usually closed) drawer,
+    are passed on to update_deferred_selection_dependent_outputs, which only runs once this response has arrived.
+    """
+    # Maps each requested output to the key it is memoized under in the browser
+    requested = request["outputs"]
+    # Empty requests only cancel a request for an earlier selection (see PENDING_SELECTION in assets/clientside.js)
+    if not requested:
+        raise PreventUpdate
+    question, subquestion = utils.extract_question_subquestion(
+        request["question_value"]
     )
-    return figure
 
+    if "map" in requested:
+        us_map = get_map(
+            question, subquestion, request["state"], request["impact"]
+        )
+    else:
+        us_map = no_update
+
+    if "selected" in requested:
+        selected_question_bar_plot = get_selected_question_bar_plot(
+            question=question,
+            subquestion=subquestion,
+            state=request["state"],
+            stratify=request["stratify"],
+            threshold=utils.get_threshold(request["show_all"]),
+        )
+    else:
+        selected_question_bar_plot = no_update
+
+    deferred = {
+        name: key
+        for name, key in requested.items()
+        if name in DEFERRED_OUTPUTS
+    }
+
+    # NOTE: The request counter (seq) is not echoed back, so that responses for the same selection are identical
+    # and can be served from the cache of compressed responses
+    figure_memo_keys = {
+        "domain": request["domain"],
+        "outputs": {
+            name: key
+            for name, key in requested.items()
+            if name not in DEFERRED_OUTPUTS
+        },
+        "deferred": bool(deferred),
+    }
+    deferred_request = (
+        {**request, "outputs": deferred} if deferred else no_update
+    )
 
-@callback(
-    Output("selected-question-title", "children"),
-    Input("state-select", "value"),
-    prevent_initial_call=True,
-)
-def update_selected_question_title(state):
-    """Update the title for the selected question based on the selected state."""
-    if state is None:
-        return ALL_STATES_LABEL
-    return state
+    return (
+        us_map,
+        selected_question_bar_plot,
+        figure_memo_keys,
+        deferred_request,
+    )
 
 
 @callback(
-    Output("selected-question-container", "display"),
-    Input("impact-select", "value"),
+    [
+        Output("sample-descriptive-plot", "figure"),
+        Output(
+            {"type": "stacked-bar-plot", "domain": ALL, "question": ALL},
+            "figure",
+        ),
+        Output("stacked-bar-plot-keys", "data"),
+        Output("figure-memo-keys", "data", allow_duplicate=True),
+    ],
+    Input("deferred-selection-request", "data"),
+    State("stacked-bar-plot-keys", "data"),
     prevent_initial_call=True,
 )
-def toggle_selected_question_bar_plot_visibility(impact):
-    """Toggle visibility of the selected question bar plot component based on whether an impact is selected."""
-    if impact is not None:
-        return "none"
-    return "flex"
+@traced
+def update_deferred_selection_dependent_outputs(
+    request, stacked_bar_plot_keys
+):
+    """
+    Update the descriptive plot and the stacked bar plots of the visible domain tab,
+    after the outputs the user is looking at (see update_selection_dependent_outputs).
+    """
+    requested = request["outputs"]
+    if not requested:
+        raise PreventUpdate
+    state = request["state"]
+
+    if "descriptive" not in requested:
+        descriptive_plot = no_update
+    elif DESCRIPTIVE_PLOT_UPDATE_MODE == "patch":
+        descriptive_plot = make_descriptive_plot_patch(state=state)
+    else:
+        descriptive_plot = get_sample_descriptive_plot(state=state)
+
+    # NOTE: The plots in the active tab are compared against the key they were last rendered with,
+    # so switching to a tab that is out of date also updates its plots
+    if "stacked" in requested:
+        stacked_bar_plots, stacked_bar_plot_keys = get_stacked_bar_plots(
+            state=state,
+            stratify=request["stratify"],
+            threshold=utils.get_threshold(request["show_all"]),
+            active_domain=request["domain"],
+            rendered_keys=stacked_bar_plot_keys,
+            outputs_list=ctx.outputs_list[1],
+        )
+    else:
+        stacked_bar_plots = [no_update] * len(ctx.outputs_list[1])
+        stacked_bar_plot_keys = no_update
+
+    figure_memo_keys = {
+        "domain": request["domain"],
+        "outputs": {
+            name: key
+            for name, key in requested.items()
+            if name != "stacked" or stacked_bar_plot_keys is not no_update
+        },
+        "deferred": False,
+    }
+
+    return (
+        descriptive_plot,
+        stacked_bar_plots,
+        stacked_bar_plot_keys,
+        figure_memo_keys,
+    )
 
 
-@callback(
-    Output("all-questions-title", "children"),
-    Input("state-select", "value"),
+clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="prefetchHoveredState"
+    ),
+    Output("figure-memo-size", "data", allow_duplicate=True),
+    Input("us-map", "hoverData"),
+    [
+        State("state-select", "value"),
+        State("question-select", "value"),
+        State("impact-select", "value"),
+        State("party-stratify-switch", "checked"),
+        State("response-threshold-control", "checked"),
+        State("domain-tabs", "value"),
+        State("figure-memo-config", "data"),
+    ],
     prevent_initial_call=True,
 )
-def update_all_questions_title(state):
-    """Update the title for the section for all questions based on the selected state."""
-    if state is None:
-        return f"{SECTION_TITLES['all_questions']}: {ALL_STATES_LABEL}"
-    return f"{SECTION_TITLES['all_questions']}: {state}"
 
 
-@callback(
-    Output({"type": "stacked-bar-plot", "question": ALL}, "figure"),
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="memoizeFigures"),
+    Output("figure-memo-size", "data"),
+    Input("figure-memo-keys", "data"),
     [
-        Input("state-select", "value"),
-        Input("party-stratify-switch", "checked"),
-        Input("response-threshold-control", "checked"),
+        State("sample-descriptive-plot", "figure"),
+        State("us-map", "figure"),
+        State("selected-question-bar-plot", "figure"),
+        State(
+            {"type": "stacked-bar-plot", "domain": ALL, "question": ALL},
+            "figure",
+        ),
+        State(
+            {"type": "stacked-bar-plot", "domain": ALL, "question": ALL}, "id"
+        ),
+        State("state-select", "value"),
+        State("question-select", "value"),
+        State("impact-select", "value"),
+        State("party-stratify-switch", "checked"),
+        State("response-threshold-control", "checked"),
+        State("domain-tabs", "value"),
+        State("figure-memo-config", "data"),
     ],
-    prevent_initial_call=True,
 )
-def update_stacked_bar_plots(
-    state,
-    is_party_stratify_checked,
-    show_all_responses_checked,
-):
-    """Update the stacked bar plots for all questions based on the selected criteria."""
-    if show_all_responses_checked:
-        threshold = None
-    elif not show_all_responses_checked:
-        threshold = DEFAULT_QUESTION["outcome"]
-
-    figure_lookup_key = (
-        state,
-        is_party_stratify_checked,
-        threshold,
-        NUM_DECIMALS,
-    )
-
-    figures = []
-    for output in ctx.outputs_list:
-        # Example: {'id': {'question': 'q2', 'type': 'stacked-bar-plot'}, 'property': 'figure'}
-        question = output["id"]["question"]
-        figures.append(PRERENDERED_BARPLOTS[figure_lookup_key][question])
-
-    return figures
 
 
 if __name__ == "__main__":
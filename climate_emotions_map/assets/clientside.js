@@ -0,0 +1,422 @@
+/*
+ * Clientside callbacks for updates that do not need a server round trip: text and visibility updates,
+ * and figures that were already received from the server (browser-side figure memo).
+ * The lookup tables they use (sample sizes, section titles, question subtitles) are shipped once in the page
+ * via the "lookup-tables" store (see create_lookup_tables_store in layout.py).
+ *
+ * NOTE: The text formatting here mirrors the helpers in utility.py, which are used for the initial layout.
+ */
+
+/*
+ * Figures already received from the server, keyed on the inputs they depend on (see getFigureMemoKeys),
+ * so that revisiting a selection renders them without a server request.
+ * The memo is bounded to the most recently used figures (figure-memo-config store).
+ *
+ * NOTE: The memo is kept in memory rather than in a dcc.Store with storage_type="session",
+ * since a few map figures are enough to exceed the sessionStorage quota of most browsers.
+ */
+const FIGURE_MEMO = new Map();
+
+// Mirrors DEFERRED_OUTPUTS in app.py
+const DEFERRED_OUTPUTS = ["descriptive", "stacked"];
+// Mirrors PREFETCHED_OUTPUTS in app.py (the server only returns figures that are prerendered or cached, and maps)
+const PREFETCHED_OUTPUTS = ["descriptive", "map", "selected", "stacked"];
+
+function getFigureMemoKeys(state, questionValue, impact, stratify, showAll, activeDomain, config) {
+    const threshold = showAll ? null : config.default_threshold;
+    return {
+        descriptive: JSON.stringify(["descriptive", state]),
+        map: JSON.stringify(["map", questionValue, state, impact]),
+        selected: JSON.stringify(["selected", questionValue, state, stratify, threshold]),
+        stacked: JSON.stringify(["stacked", activeDomain, state, stratify, threshold]),
+    };
+}
+
+function getStackedBarPlotKey(state, stratify, showAll, config) {
+    // Mirrors get_stacked_bar_plot_key in utility.py
+    return [state, stratify, showAll ? null : config.default_threshold];
+}
+
+function getMemoizedFigure(key) {
+    const figure = FIGURE_MEMO.get(key);
+    if (figure === undefined) {
+        return undefined;
+    }
+    // Mark as most recently used
+    FIGURE_MEMO.delete(key);
+    FIGURE_MEMO.set(key, figure);
+    // Plotly may modify the figure it is given, so hand out copies
+    return structuredClone(figure);
+}
+
+function memoizeFigure(key, figure, config) {
+    if (figure === undefined || figure === null || config.max_entries <= 0) {
+        return;
+    }
+    FIGURE_MEMO.delete(key);
+    FIGURE_MEMO.set(key, structuredClone(figure));
+    while (FIGURE_MEMO.size > config.max_entries) {
+        FIGURE_MEMO.delete(FIGURE_MEMO.keys().next().value);
+    }
+}
+
+/*
+ * The number of the latest selection request, the memo keys of the figures requested for it,
+ * and which server callback ("request" or "deferred") is still working on them (null if none).
+ * Responses are matched to the request by their memo keys (figure-memo-keys store) rather than by number,
+ * so that the responses for the same selection are identical and can be cached by the server.
+ *
+ * Dash drops the response of a server callback that is triggered again while it is running. So when the figures for
+ * a newer selection are all memoized, an empty request is sent to the callback that is still running, instead of
+ * letting its (stale) response overwrite the figures just restored from the memo.
+ */
+const PENDING_SELECTION = { seq: 0, keys: [], callback: null };
+
+/*
+ * State of the (opt-in) prefetch of figures for the state hovered on the map.
+ * Only one prefetch is pending or in flight at a time: hovering another state cancels it.
+ */
+const PREFETCH = { state: undefined, timer: null, controller: null, started: false };
+
+function cancelPrefetch() {
+    clearTimeout(PREFETCH.timer);
+    if (PREFETCH.controller !== null) {
+        PREFETCH.controller.abort();
+    }
+    PREFETCH.state = undefined;
+    PREFETCH.timer = null;
+    PREFETCH.controller = null;
+    PREFETCH.started = false;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        toggleDrawer: function (nClicks, opened) {
+            return !opened;
+        },
+
+        /*
+         * Update the state dropdown when a specific state is clicked (if party stratify switch is not checked),
+         * disable the state dropdown when the party stratify switch is checked,
+         * and disable the party stratify switch when a specific state is selected (i.e., not null).
+         */
+        updateStateSelection: function (clickData, isPartyStratifyChecked, selectedState) {
+            const noUpdate = window.dash_clientside.no_update;
+            const triggeredId = window.dash_clientside.callback_context.triggered_id;
+
+            if (triggeredId === "us-map") {
+                if (isPartyStratifyChecked) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                const point = clickData.points[0];
+                // TODO: This is a temporary fix to handle the edge case where the exact same point (coords)
+                // on the map is selected twice, in which case the customdata key is for some reason missing
+                // from the clickData of the second click.
+                // This workaround assumes that this can only happen in cases where the clicked state is
+                // the same as the currently selected state, and thus will deselect the state in this case.
+                if (point.customdata === undefined) {
+                    return [null, noUpdate, false, false];
+                }
+                const mapSelectedState = point.customdata[0];
+                if (mapSelectedState === selectedState) {
+                    return [null, noUpdate, false, false];
+                }
+                return [mapSelectedState, noUpdate, false, true];
+            }
+            if (triggeredId === "party-stratify-switch") {
+                // Deselect any state
+                return [null, isPartyStratifyChecked, noUpdate, noUpdate];
+            }
+            if (selectedState !== null && selectedState !== undefined) {
+                return [noUpdate, noUpdate, false, true];
+            }
+            return [noUpdate, noUpdate, false, false];
+        },
+
+        updateStateTexts: function (state, tables) {
+            const sampleSize =
+                state === null || state === undefined
+                    ? tables.national_sample_size
+                    : tables.sample_sizes[state];
+            const sampleSizeText = `Sample size: ${Number(sampleSize).toLocaleString("en-US")}`;
+
+            if (state === null || state === undefined) {
+                return [
+                    tables.all_states_label,
+                    sampleSizeText,
+                    tables.all_states_label,
+                    `${tables.section_titles.all_questions}: ${tables.all_states_label}`,
+                ];
+            }
+            return [
+                `State: ${state}`,
+                sampleSizeText,
+                state,
+                `${tables.section_titles.all_questions}: ${state}`,
+            ];
+        },
+
+        resetImpactSelect: function (questionValue) {
+            return null;
+        },
+
+        updateMapTitle: function (impact, options, tables) {
+            const option = (options || []).find((opt) => opt.value === impact);
+            if (option === undefined) {
+                return tables.section_titles.map_opinions;
+            }
+            return `${tables.section_titles.map_impacts}: ${option.label}`;
+        },
+
+        updateMapSubtitle: function (questionValue, impact, tables) {
+            if (impact !== null && impact !== undefined) {
+                return "";
+            }
+            return tables.question_subtitles[questionValue];
+        },
+
+        toggleSelectedQuestionBarPlotVisibility: function (impact) {
+            if (impact !== null && impact !== undefined) {
+                return "none";
+            }
+            return "flex";
+        },
+
+        /*
+         * Work out which figures need updating for the inputs that changed (as documented in
+         * update_selection_dependent_outputs in app.py), use the memoized ones and only request the rest from the server.
+         */
+        requestSelectionDependentOutputs: function (
+            state,
+            questionValue,
+            impact,
+            stratify,
+            showAll,
+            activeDomain,
+            stackedBarPlotIds,
+            stackedBarPlotKeys,
+            config
+        ) {
+            const noUpdate = window.dash_clientside.no_update;
+            const triggeredIds = new Set(
+                window.dash_clientside.callback_context.triggered.map((t) => t.prop_id.split(".")[0])
+            );
+            const stateChanged = triggeredIds.has("state-select");
+            const questionChanged = triggeredIds.has("question-select");
+            const impactChanged = triggeredIds.has("impact-select");
+            const barOptionsChanged =
+                triggeredIds.has("party-stratify-switch") || triggeredIds.has("response-threshold-control");
+
+            const stackedBarPlotKey = getStackedBarPlotKey(state, stratify, showAll, config);
+            const needed = [];
+            if (stateChanged) {
+                needed.push("descriptive");
+            }
+            if (stateChanged || questionChanged || impactChanged) {
+                needed.push("map");
+            }
+            if (stateChanged || questionChanged || barOptionsChanged) {
+                needed.push("selected");
+            }
+            if (JSON.stringify(stackedBarPlotKeys[activeDomain]) !== JSON.stringify(stackedBarPlotKey)) {
+                needed.push("stacked");
+            }
+
+            const memoKeys = getFigureMemoKeys(state, questionValue, impact, stratify, showAll, activeDomain, config);
+            const figures = {};
+            const missing = {};
+            for (const name of needed) {
+                const figure = getMemoizedFigure(memoKeys[name]);
+                if (figure === undefined) {
+                    missing[name] = memoKeys[name];
+                } else {
+                    figures[name] = figure;
+                }
+            }
+
+            let stackedBarPlots = stackedBarPlotIds.map(() => noUpdate);
+            let updatedStackedBarPlotKeys = noUpdate;
+            if (figures.stacked !== undefined) {
+                stackedBarPlots = stackedBarPlotIds.map((id) =>
+                    id.domain === activeDomain ? figures.stacked[id.question] : noUpdate
+                );
+                updatedStackedBarPlotKeys = { ...stackedBarPlotKeys, [activeDomain]: stackedBarPlotKey };
+            }
+
+            PENDING_SELECTION.seq += 1;
+            const selection = {
+                seq: PENDING_SELECTION.seq,
+                state: state,
+                question_value: questionValue,
+                impact: impact,
+                stratify: stratify,
+                show_all: showAll,
+                domain: activeDomain,
+                outputs: missing,
+            };
+            // The server sends the map and selected question bar plot first and then passes on the deferred outputs,
+            // which can be requested directly if they are the only ones missing
+            let request = noUpdate;
+            let deferredRequest = noUpdate;
+            if (Object.keys(missing).length > 0) {
+                if (Object.keys(missing).every((name) => DEFERRED_OUTPUTS.includes(name))) {
+                    deferredRequest = selection;
+                } else {
+                    request = selection;
+                }
+            }
+            // Cancel the response for an earlier selection that is still on its way
+            if (PENDING_SELECTION.callback === "request" && request === noUpdate) {
+                request = { ...selection, outputs: {} };
+            } else if (PENDING_SELECTION.callback === "deferred" && deferredRequest === noUpdate) {
+                deferredRequest = { ...selection, outputs: {} };
+            }
+            PENDING_SELECTION.callback = null;
+            PENDING_SELECTION.keys = Object.values(missing);
+            if (request !== noUpdate && Object.keys(request.outputs).length > 0) {
+                PENDING_SELECTION.callback = "request";
+            } else if (deferredRequest !== noUpdate && Object.keys(deferredRequest.outputs).length > 0) {
+                PENDING_SELECTION.callback = "deferred";
+            }
+
+            return [
+                figures.descriptive ?? noUpdate,
+                figures.map ?? noUpdate,
+                figures.selected ?? noUpdate,
+                stackedBarPlots,
+                updatedStackedBarPlotKeys,
+                request,
+                deferredRequest,
+            ];
+        },
+
+        /*
+         * After the mouse has stayed on a state of the map for a short time, fetch the figures that clicking it
+         * would show into the figure memo, with a low priority so it does not delay requests for the actual selection.
+         */
+        prefetchHoveredState: function (
+            hoverData,
+            selectedState,
+            questionValue,
+            impact,
+            stratify,
+            showAll,
+            activeDomain,
+            config
+        ) {
+            const noUpdate = window.dash_clientside.no_update;
+            // States cannot be selected on the map when the party stratification is shown
+            if (!config.prefetch_url || config.max_entries <= 0 || stratify) {
+                return noUpdate;
+            }
+            const point = hoverData?.points?.[0];
+            if (point?.customdata === undefined) {
+                // Keep a prefetch that is already in flight, since the state may have been clicked
+                if (!PREFETCH.started) {
+                    cancelPrefetch();
+                }
+                return noUpdate;
+            }
+            // Clicking the selected state deselects it (see updateStateSelection)
+            const hoveredState = point.customdata[0];
+            const state = hoveredState === selectedState ? null : hoveredState;
+            if (state === PREFETCH.state) {
+                return noUpdate;
+            }
+            cancelPrefetch();
+
+            const memoKeys = getFigureMemoKeys(state, questionValue, impact, stratify, showAll, activeDomain, config);
+            const missing = Object.fromEntries(
+                Object.entries(memoKeys).filter(
+                    ([name, key]) => PREFETCHED_OUTPUTS.includes(name) && !FIGURE_MEMO.has(key)
+                )
+            );
+            if (Object.keys(missing).length === 0) {
+                return noUpdate;
+            }
+
+            const controller = new AbortController();
+            PREFETCH.state = state;
+            PREFETCH.controller = controller;
+            PREFETCH.timer = setTimeout(() => {
+                PREFETCH.started = true;
+                fetch(config.prefetch_url, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({
+                        state: state,
+                        question_value: questionValue,
+                        impact: impact,
+                        stratify: stratify,
+                        show_all: showAll,
+                        domain: activeDomain,
+                        outputs: missing,
+                    }),
+                    signal: controller.signal,
+                    priority: "low",
+                })
+                    .then((response) => (response.ok ? response.json() : {}))
+                    .then((figures) => {
+                        for (const [key, figure] of Object.entries(figures)) {
+                            memoizeFigure(key, figure, config);
+                        }
+                        window.dash_clientside.set_props("figure-memo-size", { data: FIGURE_MEMO.size });
+                    })
+                    // Cancelled or failed prefetches are simply not memoized
+                    .catch(() => {})
+                    .finally(() => {
+                        if (PREFETCH.controller === controller) {
+                            cancelPrefetch();
+                        }
+                    });
+            }, config.prefetch_dwell_ms);
+            return noUpdate;
+        },
+
+        /*
+         * Memoize the figures just sent by the server (or, on page load, the initial figures of the layout).
+         */
+        memoizeFigures: function (
+            figureMemoKeys,
+            descriptiveFigure,
+            mapFigure,
+            selectedFigure,
+            stackedBarPlotFigures,
+            stackedBarPlotIds,
+            state,
+            questionValue,
+            impact,
+            stratify,
+            showAll,
+            activeDomain,
+            config
+        ) {
+            if (figureMemoKeys === null || figureMemoKeys === undefined) {
+                // On page load, memoize the initial figures of the layout
+                figureMemoKeys = {
+                    domain: activeDomain,
+                    outputs: getFigureMemoKeys(state, questionValue, impact, stratify, showAll, activeDomain, config),
+                };
+            } else if (Object.values(figureMemoKeys.outputs).every((key) => PENDING_SELECTION.keys.includes(key))) {
+                // The deferred figures for the latest selection may still be on their way
+                PENDING_SELECTION.callback = figureMemoKeys.deferred ? "deferred" : null;
+            }
+            const outputs = figureMemoKeys.outputs;
+            const figures = {
+                descriptive: descriptiveFigure,
+                map: mapFigure,
+                selected: selectedFigure,
+                stacked: Object.fromEntries(
+                    stackedBarPlotIds
+                        .map((id, i) => [id, stackedBarPlotFigures[i]])
+                        .filter(([id]) => id.domain === figureMemoKeys.domain)
+                        .map(([id, figure]) => [id.question, figure])
+                ),
+            };
+            for (const [name, key] of Object.entries(outputs)) {
+                memoizeFigure(key, figures[name], config);
+            }
+            return FIGURE_MEMO.size;
+        },
+    },
+});
@@ -0,0 +1,100 @@
+/*
+ * Replacements for the server callbacks when the dashboard is exported as a static site (see code/export_static_site.py).
+ * The figures for every possible selection are exported to JSON files, which are looked up by their memo keys
+ * (see getFigureMemoKeys in clientside.js) through one index file per kind of figure.
+ *
+ * NOTE: This file is only loaded by the exported site, the app ignores it (see assets_ignore in app.py).
+ */
+
+// The Dash renderer needs a JSON content type, which static file servers only set based on the file extension
+const STATIC_EXPORT_JSON_ENDPOINTS = ["_dash-layout", "_dash-dependencies"];
+const fetchFromServer = window.fetch.bind(window);
+window.fetch = function (resource, options) {
+    if (typeof resource === "string" && STATIC_EXPORT_JSON_ENDPOINTS.some((endpoint) => resource.endsWith(endpoint))) {
+        resource = `${resource}.json`;
+    }
+    return fetchFromServer(resource, options);
+};
+
+// Maps each kind of figure (e.g., "map") to a promise of its index, which maps memo keys to file names
+const FIGURE_INDEXES = {};
+
+function loadExportedFigure(memoKey) {
+    const kind = JSON.parse(memoKey)[0];
+    if (FIGURE_INDEXES[kind] === undefined) {
+        FIGURE_INDEXES[kind] = fetch(`figures/index-${kind}.json`).then((response) => response.json());
+    }
+    return FIGURE_INDEXES[kind]
+        .then((index) => fetch(`figures/${index[memoKey]}.json`))
+        .then((response) => response.json());
+}
+
+function loadExportedFigures(outputs) {
+    const names = Object.keys(outputs);
+    return Promise.all(names.map((name) => loadExportedFigure(outputs[name]))).then((figures) =>
+        Object.fromEntries(names.map((name, i) => [name, figures[i]]))
+    );
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    static_export: {
+        // Mirrors update_selection_dependent_outputs in app.py
+        updateSelectionDependentOutputs: function (request) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (Object.keys(request.outputs).length === 0) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const outputs = {};
+            const deferred = {};
+            for (const [name, key] of Object.entries(request.outputs)) {
+                (DEFERRED_OUTPUTS.includes(name) ? deferred : outputs)[name] = key;
+            }
+
+            return loadExportedFigures(outputs).then((figures) => [
+                figures.map ?? noUpdate,
+                figures.selected ?? noUpdate,
+                {
+                    domain: request.domain,
+                    outputs: outputs,
+                    deferred: Object.keys(deferred).length > 0,
+                },
+                Object.keys(deferred).length > 0 ? { ...request, outputs: deferred } : noUpdate,
+            ]);
+        },
+
+        // Mirrors update_deferred_selection_dependent_outputs in app.py
+        updateDeferredSelectionDependentOutputs: function (request, stackedBarPlotKeys, stackedBarPlotIds) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (Object.keys(request.outputs).length === 0) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const outputs = { ...request.outputs };
+
+            // The stacked bar plot key is the end of the memo key: [state, stratify, threshold]
+            let stackedBarPlotKey = null;
+            if (outputs.stacked !== undefined) {
+                stackedBarPlotKey = JSON.parse(outputs.stacked).slice(2);
+                if (JSON.stringify(stackedBarPlotKeys[request.domain]) === JSON.stringify(stackedBarPlotKey)) {
+                    delete outputs.stacked;
+                }
+            }
+
+            return loadExportedFigures(outputs).then((figures) => {
+                let stackedBarPlots = stackedBarPlotIds.map(() => noUpdate);
+                let updatedStackedBarPlotKeys = noUpdate;
+                if (figures.stacked !== undefined) {
+                    stackedBarPlots = stackedBarPlotIds.map((id) =>
+                        id.domain === request.domain ? figures.stacked[id.question] : noUpdate
+                    );
+                    updatedStackedBarPlotKeys = { ...stackedBarPlotKeys, [request.domain]: stackedBarPlotKey };
+                }
+                return [
+                    figures.descriptive ?? noUpdate,
+                    stackedBarPlots,
+                    updatedStackedBarPlotKeys,
+                    { domain: request.domain, outputs: outputs, deferred: false },
+                ];
+            });
+        },
+    },
+});
@@ -36,7 +36,12 @@ def load_data_dictionary(file: str) -> pd.DataFrame:
 
 
 def load_prerendered_figures(file: str) -> dict:
-    """Load a pickle file containing a dictionary of prerendered plotly figures."""
+    """
+    Load a pickle file containing a dictionary of prerendered plotly figures serialized to JSON.
+
+    The figures are only parsed when they are looked up, since validating thousands of plotly figure objects
+    at startup is slow and takes a lot of memory.
+    """
     target_file = BASE_PATH / "code/assets" / file
     # Because this module always runs the loaders, even when imported by the create_prerendered_figures module
     # we need to allow for the file to not exist yet when we want to run the script the first time
@@ -47,7 +52,26 @@ def load_prerendered_figures(file: str) -> dict:
         return {}
 
     print(f"Loading prerendered figures from {target_file}")
-    return pkl.load(target_file.open("rb"))
+    figures = pkl.load(target_file.open("rb"))
+
+    # Files made by older versions of create_prerendered_figures.py contain plotly figure objects,
+    # which would only fail when they are looked up
+    first_figure = next(iter(figures.values()), None)
+    # The stacked bar plots are stored in a dictionary keyed on question
+    if isinstance(first_figure, dict):
+        first_figure = next(iter(first_figure.values()), None)
+    if first_figure is not None and not isinstance(first_figure, str):
+        raise RuntimeError(
+            f"{target_file} contains {type(first_figure).__name__} objects instead of figures serialized to JSON. "
+            "Re-run code/create_prerendered_figures.py to regenerate it."
+        )
+    return figures
+
+
+def get_prerendered_figure(figures: dict, key: tuple) -> dict | None:
+    """Look up a prerendered figure and parse it from JSON, returning None if it was not prerendered."""
+    figure_json = figures.get(key)
+    return json.loads(figure_json) if figure_json is not None else None
 
 
 def remove_ignored_rows(df: pd.DataFrame) -> pd.DataFrame:
@@ -174,3 +198,9 @@ DOMAIN_TEXT = get_domain_text()
 NATIONAL_SAMPLE_SIZE = SURVEY_DATA["samplesizes_state.tsv"]["n"].sum()
 GEOJSON_OBJECTS = load_geojson_objects()
 PRERENDERED_BARPLOTS = load_prerendered_figures("prerendered_figures.pkl")
+PRERENDERED_SINGLE_BARPLOTS = load_prerendered_figures(
+    "prerendered_single_figures.pkl"
+)
+PRERENDERED_DESCRIPTIVE_PLOTS = load_prerendered_figures(
+    "prerendered_descriptive_figures.pkl"
+)
@@ -0,0 +1,124 @@
+"""Thread-safe LRU cache for plotly figures rendered on demand, bounded by serialized size."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+def get_serialized_size(figure_json: str) -> int:
+    """Return the size in bytes of a figure serialized to JSON."""
+    return len(figure_json.encode("utf-8"))
+
+
+class FigureCache:
+    """
+    Least-recently-used cache of plotly figures, stored serialized to JSON (e.g., with figure.to_json()).
+
+    The cache is bounded by the total size of the serialized figures rather than by the number of entries,
+    since figure sizes vary a lot (e.g., party-stratified vs. whole sample figures).
+    Storing the figures serialized means their size is measured without serializing them a second time.
+    All operations are guarded by a lock so a single instance can be shared between gunicorn worker threads.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        get_size: Callable[[Any], int] = get_serialized_size,
+        on_lookup: Callable[[bool], None] | None = None,
+    ):
+        self.max_bytes = max_bytes
+        # Also allows caching other values (e.g., compressed responses) with their own notion of size
+        self.get_size = get_size
+        # Called with whether each lookup was a hit, e.g. to export metrics
+        self.on_lookup = on_lookup
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Maps key -> (figure, size in bytes), ordered from least to most recently used
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the cached figure for a key (or None if missing) and record the hit/miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if self.on_lookup is not None:
+            self.on_lookup(entry is not None)
+        return None if entry is None else entry[0]
+
+    def peek(self, key: Hashable) -> Any | None:
+        """Return the cached figure for a key (or None if missing) without recording a lookup or marking it as used."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def put(self, key: Hashable, figure: Any):
+        """Add a figure to the cache, evicting the least recently used figures if the size bound is exceeded."""
+        size = self.get_size(figure)
+        # A figure that can never fit would otherwise flush the whole cache
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """
+        Return the cached figure for a key, rendering and caching it first if needed.
+
+        NOTE: Rendering happens outside of the lock so that a slow render does not block other threads.
+        Two threads missing on the same key at the same time may therefore both render the figure.
+        """
+        figure = self.get(key)
+        if figure is None:
+            figure = render()
+            self.put(key, figure)
+        return figure
+
+    def reset_stats(self):
+        """Reset the hit/miss/eviction counters without removing any cached figures."""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def clear(self):
+        """Remove all cached figures and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+        self.reset_stats()
+
+    def stats(self) -> dict:
+        """Return usage statistics, e.g. to help choose an appropriate size bound."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
@@ -0,0 +1,267 @@
+"""
+Request hooks of the Flask server of the app, for the metrics, tracing and profiling of the callback requests,
+the ETag-validated layout serialized at startup and the cache of compressed callback responses.
+
+Each hook depends on the ones that run before it (e.g., the metrics include the time to serve cached responses,
+and the size of the compressed response), so they are all registered in register_instrumentation,
+which sets the order they run in.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import flask
+from dash import Dash
+from dash._utils import to_json
+
+from .metrics import record_callback, record_figure_lookup, record_output_sizes
+from .payload_sizes import get_output_sizes
+from .profiling import start_profile, stop_profile
+from .response_cache import PrecompressedResponseCache
+from .tracing import add_span_since_last_end, end_trace, span, start_trace
+
+# Whether to record the size of each callback output in the metrics (opt-in since the responses have to be parsed)
+RECORD_OUTPUT_SIZES = (
+    os.environ.get("RECORD_OUTPUT_SIZES", "false").lower() == "true"
+)
+
+# Name under which requests for unknown callbacks are recorded in the metrics and statistics
+UNKNOWN_CALLBACK_NAME = "unknown"
+
+
+def make_gzip_response(response: flask.Response, compressed: bytes):
+    """Set the body of a response to gzip-compressed bytes."""
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def register_instrumentation(
+    app: Dash,
+    response_cache: PrecompressedResponseCache,
+    compress_responses: bool,
+):
+    """
+    Register the request hooks on the server of the app.
+
+    The before_request hooks run in this order:
+    1. start_callback_timer (metrics), first so that the time to serve cached responses is also recorded
+    2. start_callback_trace (tracing)
+    3. serve_serialized_layout (ETag layout)
+    4. serve_precompressed_response (compressed responses), which skips the rest (and the callback) on a hit
+    5. start_callback_profile (profiling), so that only requests that run the callback are profiled
+
+    The after_request hooks run in this order:
+    1. trace_response_serialization (tracing), right after Dash has serialized the callback outputs
+    2. record_callback_output_sizes (metrics), before the response is compressed
+    3. compress_and_cache_response (compressed responses), before flask-compress, which then skips the response
+    4. record_callback_metrics (metrics), so that the size of the compressed response is recorded
+    5. end_callback_trace (tracing), so that the trace covers the compression of the response
+
+    end_callback_profile (profiling) runs once the response is sent, even if the request failed,
+    so that the profile covers the compression of the response and the profiler is always stopped.
+    """
+    server = app.server
+    callback_path = (
+        f"{app.config.routes_pathname_prefix}_dash-update-component"
+    )
+    layout_path = f"{app.config.routes_pathname_prefix}_dash-layout"
+
+    # The layout never changes, so it is serialized (and compressed) once rather than on every page load
+    serialized_layout = to_json(app.layout).encode("utf-8")
+    compressed_layout = gzip.compress(serialized_layout, compresslevel=9)
+    layout_etag = hashlib.sha256(serialized_layout).hexdigest()[:32]
+
+    def is_callback_request() -> bool:
+        """Check whether the current request is for a callback."""
+        return (
+            flask.request.method == "POST"
+            and flask.request.path == callback_path
+        )
+
+    def is_precompressible_request() -> bool:
+        """Check whether the current request is for a callback and accepts a gzip-compressed response."""
+        return (
+            compress_responses
+            and is_callback_request()
+            and "gzip" in flask.request.accept_encodings
+        )
+
+    def get_callback_name(output: str) -> str:
+        """
+        Return the name of the function of the callback with the given output string.
+        Outputs of unknown callbacks (e.g., sent by a misbehaving client) all get the same name,
+        so that they cannot create an unbounded number of metric labels.
+        """
+        callback = app.callback_map.get(output, {}).get("callback")
+        return UNKNOWN_CALLBACK_NAME if callback is None else callback.__name__
+
+    def start_callback_timer():
+        """Record when a callback request started (see record_callback_metrics)."""
+        if is_callback_request():
+            flask.g.callback_start_time = time.perf_counter()
+
+    def start_callback_trace():
+        """Start tracing a sampled fraction of the callback requests (see tracing.py)."""
+        if is_callback_request():
+            start_trace(f"{flask.request.method} {flask.request.path}")
+
+    def serve_serialized_layout():
+        """Serve the layout serialized at startup, or a 304 response if the browser already has the same layout."""
+        if flask.request.path != layout_path:
+            return None
+
+        response = flask.Response(mimetype="application/json")
+        if compress_responses and "gzip" in flask.request.accept_encodings:
+            response = make_gzip_response(response, compressed_layout)
+            response.set_etag(f"{layout_etag}-gzip")
+        else:
+            response.set_data(serialized_layout)
+            response.set_etag(layout_etag)
+        response.vary.add("Accept-Encoding")
+        # Browsers have to check that their copy is still current (e.g., after a redeploy) before using it
+        response.cache_control.no_cache = True
+        return response.make_conditional(flask.request)
+
+    def serve_precompressed_response():
+        """Serve a callback response from the cache of compressed responses, without running the callback."""
+        if not is_precompressible_request():
+            return None
+        request_body = flask.request.get_json(silent=True)
+        if not isinstance(request_body, dict):
+            return None
+
+        key = response_cache.get_key(request_body)
+        entry = response_cache.get(key)
+        if entry is None:
+            # Compress and cache the response once the callback has run (see compress_and_cache_response)
+            flask.g.precompressed_response_key = key
+            record_figure_lookup("precompressed_responses", hit=False)
+            return None
+
+        compressed, uncompressed_bytes = entry
+        record_figure_lookup("precompressed_responses", hit=True)
+        response_cache.record(
+            callback=get_callback_name(request_body.get("output", "")),
+            uncompressed_bytes=uncompressed_bytes,
+            sent_bytes=len(compressed),
+            cache_hit=True,
+        )
+        return make_gzip_response(
+            flask.Response(mimetype="application/json"), compressed
+        )
+
+    def start_callback_profile():
+        """Start profiling a callback request if it is selected for profiling (see profiling.py)."""
+        if not is_callback_request():
+            return
+        request_body = flask.request.get_json(silent=True) or {}
+        callback_name = get_callback_name(request_body.get("output", ""))
+        profiler = start_profile(callback_name)
+        if profiler is not None:
+            flask.g.callback_profile = (profiler, callback_name)
+
+    def trace_response_serialization(response: flask.Response):
+        """Add a span for the time Dash took to serialize the outputs of a traced callback."""
+        add_span_since_last_end("serialize_response")
+        return response
+
+    def record_callback_output_sizes(response: flask.Response):
+        """Record the size of each output of a callback response, split into data and layout for figures."""
+        # Responses served from the cache of compressed responses are not recorded
+        if (
+            not RECORD_OUTPUT_SIZES
+            or not is_callback_request()
+            or response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        with span("record_output_sizes"):
+            record_output_sizes(
+                callback=get_callback_name(flask.request.get_json()["output"]),
+                output_sizes=get_output_sizes(json.loads(response.get_data())),
+            )
+        return response
+
+    def compress_and_cache_response(response: flask.Response):
+        """Compress a callback response and add it to the cache of compressed responses."""
+        key = flask.g.pop("precompressed_response_key", None)
+        # Responses without content (e.g., PreventUpdate) are left as is
+        if (
+            key is None
+            or response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        response_body = response.get_data()
+        with span("compress_response", uncompressed_bytes=len(response_body)):
+            compressed = response_cache.compress_and_put(key, response_body)
+        response_cache.record(
+            callback=get_callback_name(flask.request.get_json()["output"]),
+            uncompressed_bytes=len(response_body),
+            sent_bytes=len(compressed),
+            cache_hit=False,
+        )
+        return make_gzip_response(response, compressed)
+
+    def record_callback_metrics(response: flask.Response):
+        """Record the latency, response size and success of a callback request."""
+        start_time = flask.g.pop("callback_start_time", None)
+        if start_time is None:
+            return response
+
+        request_body = flask.request.get_json(silent=True) or {}
+        record_callback(
+            callback=get_callback_name(request_body.get("output", "")),
+            duration_s=time.perf_counter() - start_time,
+            response_bytes=(
+                0 if response.direct_passthrough else len(response.get_data())
+            ),
+            error=response.status_code >= 400,
+        )
+        return response
+
+    def end_callback_trace(response: flask.Response):
+        """End the trace of a callback request (if it is traced) and write it out."""
+        if is_callback_request():
+            request_body = flask.request.get_json(silent=True) or {}
+            end_trace(
+                callback=get_callback_name(request_body.get("output", "")),
+                status_code=response.status_code,
+            )
+        return response
+
+    def end_callback_profile(exception: BaseException | None):
+        """Stop the profile of a callback request (if it is profiled) and dump it."""
+        callback_profile = flask.g.pop("callback_profile", None)
+        if callback_profile is not None:
+            stop_profile(*callback_profile)
+
+    for hook in [
+        start_callback_timer,
+        start_callback_trace,
+        serve_serialized_layout,
+        serve_precompressed_response,
+        start_callback_profile,
+    ]:
+        server.before_request(hook)
+    # NOTE: Flask runs the after_request hooks in reverse order of registration
+    for hook in reversed(
+        [
+            trace_response_serialization,
+            record_callback_output_sizes,
+            compress_and_cache_response,
+            record_callback_metrics,
+            end_callback_trace,
+        ]
+    ):
+        server.after_request(hook)
+    server.teardown_request(end_callback_profile)
@@ -1,11 +1,22 @@
 """Generate the layout for the dashboard."""
 
+import json
+import os
+
 import dash_mantine_components as dmc
 import pandas as pd
 from dash import dcc, html
 
 from . import utility as utils
-from .data_loader import DATA_DICTIONARIES, DOMAIN_TEXT, PRERENDERED_BARPLOTS
+from .data_loader import (
+    DATA_DICTIONARIES,
+    DOMAIN_TEXT,
+    NATIONAL_SAMPLE_SIZE,
+    PRERENDERED_BARPLOTS,
+    PRERENDERED_DESCRIPTIVE_PLOTS,
+    PRERENDERED_SINGLE_BARPLOTS,
+    get_prerendered_figure,
+)
 from .make_descriptive_plots import make_descriptive_plots
 from .make_map import make_map
 from .make_stacked_bar_plots import make_stacked_bar
@@ -37,6 +48,21 @@ SINGLE_SUBQUESTION_FIG_KW = {
     "margin": {"l": 30, "r": 30, "t": 10, "b": 20},
 }
 
+# Whether only the stacked bar plots of the default domain tab are included in the initial layout.
+# The plots of the other tabs start out as empty placeholders and are fetched when their tab is first activated.
+LAZY_DOMAIN_TABS = os.environ.get("LAZY_DOMAIN_TABS", "true").lower() == "true"
+DEFAULT_DOMAIN_TEXT = DOMAIN_TEXT[DEFAULT_QUESTION["domain"]]
+
+# Figure shown in place of the stacked bar plots of a domain tab that has not been activated yet
+PLACEHOLDER_FIGURE = {
+    "data": [],
+    "layout": {
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+        "height": 100,
+    },
+}
+
 # See https://github.com/plotly/plotly.js/blob/master/src/plot_api/plot_config.js for all options
 DCC_GRAPH_CONFIG = {
     "displayModeBar": False,
@@ -125,12 +151,20 @@ def create_response_threshold_control():
 
 def create_drawer_state():
     """Create the state/cluster for the drawer."""
-    return dmc.Text(id="drawer-state", size="md")
+    return dmc.Text(
+        id="drawer-state",
+        children=utils.create_drawer_state_text(None),
+        size="md",
+    )
 
 
 def create_drawer_sample_size():
     """Create the sample size for the drawer."""
-    return dmc.Text(id="drawer-sample-size", size="md")
+    return dmc.Text(
+        id="drawer-sample-size",
+        children=utils.create_sample_size_text(None),
+        size="md",
+    )
 
 
 def create_sample_descriptives_hover_tip():
@@ -153,12 +187,18 @@ def create_sample_descriptive_note():
 
 def create_sample_descriptive_plot():
     """Create the component holding the subplots of sample descriptive statistics."""
-    return dcc.Graph(
-        id="sample-descriptive-plot",
-        figure=make_descriptive_plots(
+    figure = get_prerendered_figure(
+        PRERENDERED_DESCRIPTIVE_PLOTS, (None, NUM_DECIMALS)
+    )
+    if figure is None:
+        figure = make_descriptive_plots(
             state=None,
             decimals=NUM_DECIMALS,
-        ),
+        )
+
+    return dcc.Graph(
+        id="sample-descriptive-plot",
+        figure=figure,
         config=DCC_GRAPH_CONFIG,
         # TODO: Revisit
         # We use px instead of viewport height here for now to more easily control scrolling
@@ -412,6 +452,8 @@ def create_map_plot():
             # vh = % of viewport height
             # TODO: Revisit once plot margins are adjusted
             config=DCC_GRAPH_CONFIG,
+            # So that the hover prefetch is cancelled when the mouse leaves a state
+            clear_on_unhover=True,
             style={"height": "65vh"},
         ),
         # set max width
@@ -465,20 +507,30 @@ def create_question_heading(question_label: str) -> dmc.Text:
 
 
 # TODO: Refactor args
-def create_bar_plots_for_question(question_id: str, subquestion_id: str):
+def create_bar_plots_for_question(
+    question_id: str, subquestion_id: str, domain_text: str
+):
     """
     Create component to hold the stacked bar plot(s) for a single subquestion
     or all subquestions for a question.
     """
+    if LAZY_DOMAIN_TABS and domain_text != DEFAULT_DOMAIN_TEXT:
+        initial_figure = PLACEHOLDER_FIGURE
+    else:
+        initial_figure = json.loads(
+            PRERENDERED_BARPLOTS[
+                None, False, DEFAULT_QUESTION["outcome"], NUM_DECIMALS
+            ][question_id]
+        )
+
     figure = dmc.Container(
         dcc.Graph(
             id={
                 "type": "stacked-bar-plot",
+                "domain": domain_text,
                 "question": question_id,
             },
-            figure=PRERENDERED_BARPLOTS[
-                None, False, DEFAULT_QUESTION["outcome"], NUM_DECIMALS
-            ][question_id],
+            figure=initial_figure,
             config=DCC_GRAPH_CONFIG,
         ),
         fluid=True,
@@ -493,23 +545,40 @@ def create_selected_question_bar_plot():
     """Create the component holding a title and stacked bar plot for the selected question."""
     title = dmc.Title(
         id="selected-question-title",
-        children=ALL_STATES_LABEL,
+        children=utils.create_selected_question_title(None),
         order=4,
         fw=300,
     )
 
+    selected_question_kw = {
+        "question": DEFAULT_QUESTION["question"],
+        "subquestion": DEFAULT_QUESTION["sub_question"],
+        "state": None,
+        "stratify": False,
+        "threshold": DEFAULT_QUESTION["outcome"],
+    }
+    initial_figure = get_prerendered_figure(
+        PRERENDERED_SINGLE_BARPLOTS,
+        (
+            selected_question_kw["question"],
+            selected_question_kw["subquestion"],
+            selected_question_kw["state"],
+            selected_question_kw["stratify"],
+            selected_question_kw["threshold"],
+            NUM_DECIMALS,
+        ),
+    )
+    if initial_figure is None:
+        initial_figure = make_stacked_bar(
+            **selected_question_kw,
+            decimals=NUM_DECIMALS,
+            fig_kw=SINGLE_SUBQUESTION_FIG_KW,
+        )
+
     figure = dmc.Container(
         dcc.Graph(
             id="selected-question-bar-plot",
-            figure=make_stacked_bar(
-                question=DEFAULT_QUESTION["question"],
-                subquestion=DEFAULT_QUESTION["sub_question"],
-                state=None,
-                stratify=False,
-                threshold=DEFAULT_QUESTION["outcome"],
-                decimals=NUM_DECIMALS,
-                fig_kw=SINGLE_SUBQUESTION_FIG_KW,
-            ),
+            figure=initial_figure,
             config=DCC_GRAPH_CONFIG,
         ),
         fluid=True,
@@ -533,7 +602,7 @@ def create_all_questions_section_title() -> dmc.Title:
     """Create a title for the section containing the bar plots for all questions."""
     return dmc.Title(
         id="all-questions-title",
-        children=f"{SECTION_TITLES['all_questions']}: {ALL_STATES_LABEL}",
+        children=utils.create_all_questions_title(None),
         order=3,
         fw=300,
         pb="sm",
@@ -544,7 +613,9 @@ def create_question_components(q_row: pd.Series) -> list:
     """Create a heading and stacked bar plot component for each question."""
     return [
         create_question_heading(q_row["full_text"]),
-        create_bar_plots_for_question(q_row["question"], "all"),
+        create_bar_plots_for_question(
+            q_row["question"], "all", q_row["domain_text"]
+        ),
     ]
 
 
@@ -606,9 +677,35 @@ def create_domain_tabs():
         )
 
     return dmc.Tabs(
+        id="domain-tabs",
         children=[dmc.TabsList(children=tab_list, grow=True)] + panel_list,
         orientation="horizontal",
-        value=DOMAIN_TEXT[DEFAULT_QUESTION["domain"]],
+        value=DEFAULT_DOMAIN_TEXT,
+    )
+
+
+def create_stacked_bar_plot_keys_store():
+    """
+    Create the store recording which state and bar chart options the stacked bar plots
+    of each domain tab currently show, so that only the visible tab has to be updated.
+
+    Tabs that only hold placeholders (see LAZY_DOMAIN_TABS) have no key, so they are updated when activated.
+    """
+    initial_key = utils.get_stacked_bar_plot_key(
+        state=None,
+        stratify=False,
+        threshold=DEFAULT_QUESTION["outcome"],
+    )
+    return dcc.Store(
+        id="stacked-bar-plot-keys",
+        data={
+            domain_full: (
+                None
+                if LAZY_DOMAIN_TABS and domain_full != DEFAULT_DOMAIN_TEXT
+                else initial_key
+            )
+            for domain_full in DOMAIN_TEXT.values()
+        },
     )
 
 
@@ -647,10 +744,72 @@ def create_main():
     )
 
 
-def construct_layout():
+def create_lookup_tables_store():
+    """Create the store holding the lookup tables used by clientside callbacks, so that they are only sent once."""
+    return dcc.Store(
+        id="lookup-tables",
+        data={
+            "all_states_label": ALL_STATES_LABEL,
+            "section_titles": SECTION_TITLES,
+            "national_sample_size": int(NATIONAL_SAMPLE_SIZE),
+            "sample_sizes": utils.get_sample_sizes(),
+            "question_subtitles": utils.get_question_subtitles(),
+        },
+    )
+
+
+def create_figure_memo_stores(
+    max_entries: int,
+    prefetch_url: str | None = None,
+    prefetch_dwell_ms: int = 300,
+) -> list[dcc.Store]:
+    """
+    Create the stores used to memoize figures in the browser (see assets/clientside.js),
+    so that revisiting a selection does not need a server request.
+
+    If a prefetch URL is given, the figures for a state hovered on the map for at least
+    prefetch_dwell_ms are fetched from it in the background.
+    """
+    return [
+        # The selection (and the figures needed for it) sent to the server when a figure is not memoized
+        dcc.Store(id="selection-request"),
+        # The same, for the figures that are only requested once the ones the user is looking at have arrived
+        dcc.Store(id="deferred-selection-request"),
+        # The memo keys of the figures last sent by the server
+        dcc.Store(id="figure-memo-keys"),
+        # The number of figures currently memoized
+        dcc.Store(id="figure-memo-size"),
+        dcc.Store(
+            id="figure-memo-config",
+            data={
+                "max_entries": max_entries,
+                "default_threshold": DEFAULT_QUESTION["outcome"],
+                "prefetch_url": prefetch_url,
+                "prefetch_dwell_ms": prefetch_dwell_ms,
+            },
+        ),
+    ]
+
+
+def construct_layout(
+    figure_memo_max_entries: int = 50,
+    prefetch_url: str | None = None,
+    prefetch_dwell_ms: int = 300,
+):
     """Generate the overall dashboard layout."""
     return dmc.AppShell(
-        children=[create_header(), create_navbar(), create_main()],
+        children=[
+            create_header(),
+            create_navbar(),
+            create_main(),
+            create_lookup_tables_store(),
+            create_stacked_bar_plot_keys_store(),
+        ]
+        + create_figure_memo_stores(
+            max_entries=figure_memo_max_entries,
+            prefetch_url=prefetch_url,
+            prefetch_dwell_ms=prefetch_dwell_ms,
+        ),
         header={"height": HEADER_HEIGHT},
         navbar={
             "width": 300,
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
-from functools import partial
+import copy
+import json
+from functools import lru_cache, partial
 from textwrap import wrap
 
 import numpy as np
@@ -9,6 +11,7 @@ from plotly.colors import sample_colorscale
 from plotly.subplots import make_subplots
 
 from .data_loader import DATA_DICTIONARIES, SURVEY_DATA
+from .tracing import add_span_since_last_end, span
 
 DEMOGRAPHICS_DICTIONARY = DATA_DICTIONARIES["demographics_dictionary.tsv"]
 SAMPLEDESC_WHOLESAMPLE: pd.DataFrame = SURVEY_DATA[
@@ -167,6 +170,16 @@ def get_demographic_variable_to_display(demographic_variable: str):
     return demographic_variable_to_display
 
 
+def get_category_order(demographic_variable: str, categories) -> list[str]:
+    """Get the plotting order of the categories of a demographic variable, with any categories missing from CATEGORY_ORDERS at the end."""
+    category_order = list(CATEGORY_ORDERS[demographic_variable])
+    return category_order + [
+        category
+        for category in dict.fromkeys(categories)
+        if category not in category_order
+    ]
+
+
 def get_category_to_display(category: str, demographic_variable: str):
     if demographic_variable == "student":
         category = {"yes": "student", "no": "non-student"}[category.lower()]
@@ -200,7 +213,8 @@ def make_descriptive_plot_traces(
 
     # use custom category order
     df[COL_CATEGORY] = pd.Categorical(
-        df[COL_CATEGORY], categories=CATEGORY_ORDERS[demographic_variable]
+        df[COL_CATEGORY],
+        categories=get_category_order(demographic_variable, df[COL_CATEGORY]),
     )
     df = df.sort_values(COL_CATEGORY, ascending=not reverse)
 
@@ -307,6 +321,7 @@ def make_descriptive_plots(
     text_wrap_width: int = 14,
     colors: list[str] | None = None,
     decimals: int = 1,
+    use_template: bool = True,
 ) -> go.Figure:
     """Make the sample descriptive plots
 
@@ -322,21 +337,47 @@ def make_descriptive_plots(
         List of colors for the bar plots, by default None (uses the turbo colorscale)
     decimals : int, optional
         Number of decimal places to display, by default 1
+    use_template : bool, optional
+        Whether to fill the data of the state into a copy of a cached template figure
+        instead of building the whole figure from scratch, by default True
 
     Returns
     -------
     go.Figure
     """
+    if use_template:
+        figure_dict = json.loads(
+            get_descriptive_plots_template(
+                margins_key=(
+                    None if margins is None else tuple(sorted(margins.items()))
+                ),
+                text_wrap_width=text_wrap_width,
+                colors_key=None if colors is None else tuple(colors),
+                decimals=decimals,
+            )
+        )
+        with span("make_descriptive_plots.filter_data"):
+            all_trace_data = get_descriptive_plot_trace_data(
+                state, text_wrap_width
+            )
+        for trace, trace_data in zip(figure_dict["data"], all_trace_data):
+            trace.update(trace_data)
+        # The template was already validated when it was built and the trace data only contains
+        # plain lists of numbers/strings, so we skip plotly's (slow) validation of the whole figure
+        fig = go.Figure(figure_dict, _validate=False)
+        add_span_since_last_end("make_descriptive_plots.build_figure")
+        return fig
 
     if margins is None:
         # NOTE: L/R margins cannot be 0 or else x-axis labels can be cut off on smaller screens
         margins = {"l": 5, "r": 5, "t": 20, "b": 20}
 
     # get data to plot
-    if state is None:
-        data = SAMPLEDESC_WHOLESAMPLE
-    else:
-        data = SAMPLEDESC_STATE.loc[SAMPLEDESC_STATE["state"] == state]
+    with span("make_descriptive_plots.filter_data"):
+        if state is None:
+            data = SAMPLEDESC_WHOLESAMPLE
+        else:
+            data = SAMPLEDESC_STATE.loc[SAMPLEDESC_STATE["state"] == state]
 
     # Number of bars in each subplot
     n_categories = [2, 2, 3, 2, 3, 2, 3, 3, 5, 5, 8]
@@ -436,10 +477,166 @@ def make_descriptive_plots(
         dragmode=False,
     )
     fig.update_annotations(font_size=12)
+    add_span_since_last_end("make_descriptive_plots.build_figure")
 
     return fig
 
 
+@lru_cache(maxsize=16)
+def get_descriptive_plots_template(
+    margins_key: tuple | None,
+    text_wrap_width: int,
+    colors_key: tuple | None,
+    decimals: int,
+) -> str:
+    """
+    Build the sample descriptive plots once for a given set of figure options and return them as a JSON string.
+
+    The subplot grid, titles, axes, colors and hover templates are the same for every state,
+    so only the data arrays of the traces have to be replaced to get the figure for a specific state
+    (see get_descriptive_plot_trace_data). The template is returned as a string so that the cached value
+    cannot be modified by callers.
+
+    Parameters
+    ----------
+    margins_key : tuple | None
+        Figure margins as a tuple of (side, margin) pairs, or None for the default margins
+    text_wrap_width : int
+        Maximum width for wrapping some text labels
+    colors_key : tuple | None
+        Colors for the bar plots, or None for the default colors
+    decimals : int
+        Number of decimal places to display
+
+    Returns
+    -------
+    str
+    """
+    return make_descriptive_plots(
+        state=None,
+        margins=None if margins_key is None else dict(margins_key),
+        text_wrap_width=text_wrap_width,
+        colors=None if colors_key is None else list(colors_key),
+        decimals=decimals,
+        use_template=False,
+    ).to_json()
+
+
+def get_sampledesc_matrix() -> pd.DataFrame:
+    """
+    Combine the whole-sample and per-state sample descriptives into a single table
+    indexed by (state, demographic variable, category), with the whole sample under WHOLE_SAMPLE_KEY.
+    """
+    matrix = pd.concat(
+        [
+            SAMPLEDESC_WHOLESAMPLE.assign(state=WHOLE_SAMPLE_KEY),
+            SAMPLEDESC_STATE,
+        ]
+    )
+    return matrix.set_index(["state", COL_DEMOGRAPHIC_VARIABLE, COL_CATEGORY])[
+        [COL_N, COL_PERCENTAGE]
+    ].sort_index()
+
+
+def get_descriptive_plot_trace_data(
+    state: str | None = None, text_wrap_width: int = 14
+) -> tuple[dict, ...]:
+    """
+    Get the data arrays of each trace in the sample descriptive plots for a state.
+
+    The traces are returned in the same order as they are added to the figure in make_descriptive_plots,
+    so that the data of an existing figure can be swapped out without rebuilding the figure.
+    The data is computed once per state, and each caller gets its own copy since it ends up in figures and patches.
+
+    Parameters
+    ----------
+    state : str | None, optional
+        State/cluster label, by default None (whole sample)
+    text_wrap_width : int, optional
+        Maximum width for wrapping some text labels, by default 14
+
+    Returns
+    -------
+    tuple[dict, ...]
+        One dictionary per trace, mapping trace properties (e.g., "x", "y", "customdata") to their values
+    """
+    return copy.deepcopy(
+        _get_cached_descriptive_plot_trace_data(state, text_wrap_width)
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_cached_descriptive_plot_trace_data(
+    state: str | None, text_wrap_width: int
+) -> tuple[dict, ...]:
+    region_df = SAMPLEDESC_MATRIX.loc[
+        WHOLE_SAMPLE_KEY if state is None else state
+    ]
+
+    trace_data = []
+    for demographic_variable in SUBPLOT_POSITIONS:
+        if demographic_variable == IMPACTS_LABEL:
+            impact_df = region_df.loc[
+                [
+                    (impact, "Yes")
+                    for impact in IMPACT_VARIABLES
+                    if (impact, "Yes") in region_df.index
+                ]
+            ]
+            labels = [
+                get_demographic_variable_to_display(impact)
+                for impact, _ in impact_df.index
+            ]
+            wrapped_labels = [
+                wrap_text_label(label, width=text_wrap_width)
+                for label in labels
+            ]
+            trace_data.append(
+                {
+                    "x": wrapped_labels,
+                    "y": (impact_df[COL_PERCENTAGE] * 100).tolist(),
+                    "text": wrapped_labels,
+                    "customdata": [
+                        [label, n]
+                        for label, n in zip(labels, impact_df[COL_N].tolist())
+                    ],
+                }
+            )
+            continue
+
+        # Reverse the custom category order, as in make_descriptive_plot_traces
+        variable_df = region_df.loc[demographic_variable]
+        categories = [
+            category
+            for category in reversed(
+                get_category_order(demographic_variable, variable_df.index)
+            )
+            if category in variable_df.index
+        ]
+        variable_df = variable_df.loc[categories]
+        labels = [
+            get_category_to_display(category, demographic_variable)
+            for category in categories
+        ]
+        bar_data = {
+            "x": (variable_df[COL_PERCENTAGE] * 100).tolist(),
+            "y": labels,
+            "customdata": [
+                [n, label]
+                for n, label in zip(variable_df[COL_N].tolist(), labels)
+            ],
+        }
+        # The second trace is the transparent one holding the text labels
+        trace_data.extend([bar_data, {**bar_data, "text": labels}])
+
+    return tuple(trace_data)
+
+
+# Key used for the whole sample in SAMPLEDESC_MATRIX
+WHOLE_SAMPLE_KEY = "__whole_sample__"
+SAMPLEDESC_MATRIX = get_sampledesc_matrix()
+
+
 # if __name__ == "__main__":
 
 #     # whole sample
@@ -2,6 +2,7 @@ import pandas as pd
 import plotly.graph_objects as go
 
 from .data_loader import DATA_DICTIONARIES, GEOJSON_OBJECTS, SURVEY_DATA
+from .tracing import add_span_since_last_end, span
 
 survey_states = GEOJSON_OBJECTS["survey_states.json"]
 
@@ -130,7 +131,8 @@ def make_map(
 
     # get the state abbreviations in long format
     # "state" (i.e. state or cluster), "single_state", "state_abbreviated"
-    state_abbrevs_long = get_state_abbrevs_in_long_format()
+    with span("make_map.load_data"):
+        state_abbrevs_long = get_state_abbrevs_in_long_format()
 
     # get the question data
     df_opinions = opinions_state.loc[
@@ -170,6 +172,7 @@ def make_map(
             on=col_location,
         )
         df_to_plot[col_color_impact] *= 100
+    add_span_since_last_end("make_map.filter_data")
 
     if impact is not None and show_impact_as_gradient:
         col_gradient = col_color_impact
@@ -292,6 +295,7 @@ def make_map(
         margin=margins,
         dragmode=False,
     )
+    add_span_since_last_end("make_map.build_figure")
 
     return fig
 
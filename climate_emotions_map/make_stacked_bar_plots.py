@@ -5,6 +5,7 @@ import pandas as pd
 import plotly.express as px
 
 from .data_loader import DATA_DICTIONARIES, SUBQUESTION_ORDER, SURVEY_DATA
+from .tracing import add_span_since_last_end, span
 
 THEME = "plotly_white"
 
@@ -360,7 +361,8 @@ def make_stacked_bar(
     if palettes is None:
         palettes = PALETTES_BY_LENGTH
 
-    df = load_df(state, stratify)
+    with span("make_stacked_bar.load_data"):
+        df = load_df(state, stratify)
 
     # check question
     # assert (
@@ -441,6 +443,7 @@ def make_stacked_bar(
             print(f"unknown number of outcomes: {n_outcomes}")
 
     print(f"possible_outcomes: {q_df['outcome'].unique()}")
+    add_span_since_last_end("make_stacked_bar.filter_data")
 
     fig = plot_bars(
         q_df,
@@ -475,6 +478,7 @@ def make_stacked_bar(
     else:
         # Remove facet title
         fig.update_annotations(text="")
+    add_span_since_last_end("make_stacked_bar.build_figure")
 
     return fig
 
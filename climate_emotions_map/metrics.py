@@ -0,0 +1,91 @@
+"""
+Prometheus metrics of the server callbacks and figure lookups, exposed on the /metrics route of the app.
+
+Each gunicorn worker process has its own metrics. To aggregate the metrics of all workers, set the
+PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory (which should be emptied before each start
+of the server): the workers then write their metrics to files in that directory, which are all read
+when /metrics is requested (see https://prometheus.github.io/client_python/multiprocess/).
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+CALLBACK_DURATION = Histogram(
+    "dash_callback_duration_seconds",
+    "Time taken to respond to callback requests, including serializing and compressing the response.",
+    ["callback"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CALLBACK_CALLS = Counter(
+    "dash_callback_calls",
+    "Number of callback requests.",
+    ["callback"],
+)
+CALLBACK_ERRORS = Counter(
+    "dash_callback_errors",
+    "Number of callback requests that failed.",
+    ["callback"],
+)
+CALLBACK_RESPONSE_BYTES = Histogram(
+    "dash_callback_response_bytes",
+    "Size of the callback responses sent (after compression, if any).",
+    ["callback"],
+    buckets=(1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6),
+)
+CALLBACK_OUTPUT_BYTES = Histogram(
+    "dash_callback_output_bytes",
+    "Serialized size of the callback outputs (part is total, or data/layout for figures).",
+    ["callback", "output", "part"],
+    buckets=(1e2, 1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6),
+)
+FIGURE_LOOKUPS = Counter(
+    "figure_lookups",
+    "Number of lookups in the prerendered figure stores and in-memory caches.",
+    ["store", "result"],
+)
+
+
+def record_callback(
+    callback: str, duration_s: float, response_bytes: int, error: bool
+):
+    """Record a callback request."""
+    CALLBACK_CALLS.labels(callback=callback).inc()
+    CALLBACK_DURATION.labels(callback=callback).observe(duration_s)
+    CALLBACK_RESPONSE_BYTES.labels(callback=callback).observe(response_bytes)
+    if error:
+        CALLBACK_ERRORS.labels(callback=callback).inc()
+
+
+def record_output_sizes(
+    callback: str, output_sizes: dict[str, dict[str, int]]
+):
+    """Record the sizes of the outputs of a callback response (see payload_sizes.get_output_sizes)."""
+    for output, sizes in output_sizes.items():
+        for part, size in sizes.items():
+            CALLBACK_OUTPUT_BYTES.labels(
+                callback=callback, output=output, part=part
+            ).observe(size)
+
+
+def record_figure_lookup(store: str, hit: bool):
+    """Record a lookup in a figure store or cache."""
+    FIGURE_LOOKUPS.labels(store=store, result="hit" if hit else "miss").inc()
+
+
+def generate_metrics() -> tuple[bytes, str]:
+    """Return the metrics in the Prometheus text format (aggregated over all worker processes if enabled), and their content type."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,62 @@
+"""
+Break down the serialized size of callback responses by output, and for figures by trace and layout property.
+
+Used by the app to record the sizes of the callback outputs (see RECORD_OUTPUT_SIZES in instrumentation.py)
+and by code/check_payload_sizes.py to check them against budgets.
+"""
+
+import json
+
+
+def get_json_size(value) -> int:
+    """Return the size in bytes of a (JSON-serializable) value serialized as compact JSON, like in Dash responses."""
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def is_figure(value) -> bool:
+    """Check whether an output value is a plotly figure (rather than a Patch or another property)."""
+    return (
+        isinstance(value, dict)
+        and isinstance(value.get("data"), list)
+        and "layout" in value
+    )
+
+
+def get_trace_label(index: int, trace: dict) -> str:
+    """Return a label identifying a trace of a figure."""
+    label = f"data[{index}] {trace.get('type', 'scatter')}"
+    if trace.get("name"):
+        label = f"{label} {trace['name']!r}"
+    return label
+
+
+def get_trace_sizes(figure: dict) -> dict[str, int]:
+    """Return the size of each trace of a figure."""
+    return {
+        get_trace_label(index, trace): get_json_size(trace)
+        for index, trace in enumerate(figure["data"])
+    }
+
+
+def get_layout_sizes(figure: dict) -> dict[str, int]:
+    """Return the size of each top-level property of the layout of a figure (e.g., template, annotations)."""
+    return {
+        f"layout.{key}": get_json_size(value)
+        for key, value in figure["layout"].items()
+    }
+
+
+def get_output_sizes(response: dict) -> dict[str, dict[str, int]]:
+    """
+    Return the sizes of the outputs of a (parsed) callback response, keyed on "<id>.<property>".
+    The size of figures is also split into their data (traces) and layout.
+    """
+    sizes = {}
+    for component_id, props in response.get("response", {}).items():
+        for prop, value in props.items():
+            output_sizes = {"total": get_json_size(value)}
+            if is_figure(value):
+                output_sizes["data"] = get_json_size(value["data"])
+                output_sizes["layout"] = get_json_size(value["layout"])
+            sizes[f"{component_id}.{prop}"] = output_sizes
+    return sizes
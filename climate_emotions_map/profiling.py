@@ -0,0 +1,106 @@
+"""
+Opt-in profiling of callback requests with cProfile, to get profiles of the figure builders under real traffic.
+
+Callback requests are profiled either:
+- for a sampled fraction (PROFILE_SAMPLE_RATE, 0 by default) of the requests for the callbacks in PROFILE_CALLBACKS
+  (comma-separated callback function names, all callbacks if empty), or
+- on demand, for the next requests of a worker process, armed through the /admin/profile route of the app
+  (only available if ADMIN_TOKEN, or the older PROFILE_ADMIN_TOKEN, is set, see request_profiles).
+
+Each profile is dumped to a .pstats file in PROFILE_DIR named after the callback, the time and the process ID.
+The profiles can be aggregated into a report of the hottest functions with code/profile_report.py.
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Fraction of the requests for the selected callbacks to profile
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_CALLBACKS = {
+    name.strip()
+    for name in os.environ.get("PROFILE_CALLBACKS", "").split(",")
+    if name.strip()
+}
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "profiles"))
+
+# Profiles requested through the admin route, for the current worker process
+_requested = {"callbacks": set(), "remaining": 0}
+_requested_lock = threading.Lock()
+# Only one request is profiled at a time, so that profiles of concurrent requests do not get mixed up
+_profiler_lock = threading.Lock()
+
+
+def _matches(callback: str, callbacks: set[str]) -> bool:
+    return not callbacks or callback in callbacks
+
+
+def _should_profile(callback: str) -> bool:
+    """Check whether to profile a request for a callback (using up one of the requested profiles, if any)."""
+    with _requested_lock:
+        if _requested["remaining"] > 0 and _matches(
+            callback, _requested["callbacks"]
+        ):
+            _requested["remaining"] -= 1
+            return True
+    return (
+        PROFILE_SAMPLE_RATE > 0
+        and _matches(callback, PROFILE_CALLBACKS)
+        and random.random() < PROFILE_SAMPLE_RATE
+    )
+
+
+def request_profiles(count: int, callbacks: set[str] | None = None):
+    """Profile the next requests for the given callbacks (all callbacks if None) in the current worker process."""
+    with _requested_lock:
+        _requested["callbacks"] = set(callbacks or ())
+        _requested["remaining"] = count
+
+
+def get_profiling_status() -> dict:
+    """Return the profiling settings and the profiles still requested for the current worker process."""
+    with _requested_lock:
+        requested = {
+            "callbacks": sorted(_requested["callbacks"]),
+            "remaining": _requested["remaining"],
+        }
+    return {
+        "pid": os.getpid(),
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "sampled_callbacks": sorted(PROFILE_CALLBACKS),
+        "profile_dir": str(PROFILE_DIR.resolve()),
+        "requested": requested,
+    }
+
+
+def start_profile(callback: str) -> cProfile.Profile | None:
+    """
+    Start profiling the current thread if the request for a callback is selected for profiling,
+    unless another request is already being profiled (in which case no requested profile is used up).
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    if not _should_profile(callback):
+        _profiler_lock.release()
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile, callback: str) -> Path:
+    """Stop a profile and dump it to a .pstats file named after the callback, the time and the process ID."""
+    profiler.disable()
+    _profiler_lock.release()
+
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    # Callback names are function names, but are sanitized in case they ever come from elsewhere
+    safe_callback = re.sub(r"[^\w.]", "_", callback)
+    path = PROFILE_DIR / f"{safe_callback}-{timestamp}-{os.getpid()}.pstats"
+    profiler.dump_stats(path)
+    return path
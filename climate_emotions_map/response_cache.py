@@ -0,0 +1,132 @@
+"""
+Cache of gzip-compressed callback responses.
+
+The figures sent by the callbacks are (mostly) prerendered and never change, so the same request
+always gets the same response. Keeping the compressed response bytes means a repeated request is served
+without running the callback, serializing the figures to JSON or compressing them again.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from .figure_cache import FigureCache
+
+# Fields of the selection requests (see requestSelectionDependentOutputs in assets/clientside.js) that tell requests
+# apart in the browser but do not change the response
+REQUEST_COUNTER_FIELDS = {"seq"}
+
+
+def get_compressed_size(entry: tuple[bytes, int]) -> int:
+    """Return the size in bytes of a cached (compressed response, uncompressed size) entry."""
+    return len(entry[0])
+
+
+class PrecompressedResponseCache:
+    """
+    Least-recently-used cache of gzip-compressed responses keyed on the callback inputs and state of the request,
+    which also records how many bytes compression saves for each callback.
+    """
+
+    def __init__(
+        self, max_bytes: int, compresslevel: int = 6, min_bytes: int = 1024
+    ):
+        # NOTE: Most responses are compressed on a cache miss, on the request path,
+        # so this defaults to the compression level of flask-compress rather than the highest one
+        self.compresslevel = compresslevel
+        # Smaller responses are compressed but not cached, since they are cheap to recompute
+        self.min_bytes = min_bytes
+        self._responses = FigureCache(
+            max_bytes=max_bytes, get_size=get_compressed_size
+        )
+        self._callback_stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(request: dict) -> str:
+        """
+        Return the cache key for a (parsed) callback request, from its output and the values of its inputs and state,
+        leaving out the request counters of the selection requests.
+        """
+
+        def normalize(item):
+            value = item.get("value") if isinstance(item, dict) else None
+            if not isinstance(value, dict):
+                return item
+            return {
+                **item,
+                "value": {
+                    field: field_value
+                    for field, field_value in value.items()
+                    if field not in REQUEST_COUNTER_FIELDS
+                },
+            }
+
+        key_data = {
+            "output": request.get("output"),
+            "inputs": [normalize(item) for item in request.get("inputs", [])],
+            "state": [normalize(item) for item in request.get("state", [])],
+        }
+        return hashlib.sha256(
+            json.dumps(key_data, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> tuple[bytes, int] | None:
+        """Return the compressed response and its uncompressed size for a key (or None if missing)."""
+        return self._responses.get(key)
+
+    def compress_and_put(self, key: str, response_body: bytes) -> bytes:
+        """Compress a response, caching it if it is large enough, and return the compressed bytes."""
+        compressed = gzip.compress(
+            response_body, compresslevel=self.compresslevel
+        )
+        if len(response_body) >= self.min_bytes:
+            self._responses.put(key, (compressed, len(response_body)))
+        return compressed
+
+    def record(
+        self,
+        callback: str,
+        uncompressed_bytes: int,
+        sent_bytes: int,
+        cache_hit: bool,
+    ):
+        """Record the size of a response sent for a callback (keyed on the name of its function, from a bounded set)."""
+        with self._lock:
+            stats = self._callback_stats.setdefault(
+                callback,
+                {
+                    "responses": 0,
+                    "cache_hits": 0,
+                    "uncompressed_bytes": 0,
+                    "sent_bytes": 0,
+                },
+            )
+            stats["responses"] += 1
+            stats["cache_hits"] += cache_hit
+            stats["uncompressed_bytes"] += uncompressed_bytes
+            stats["sent_bytes"] += sent_bytes
+
+    def clear(self):
+        """Remove all cached responses and reset the statistics."""
+        self._responses.clear()
+        with self._lock:
+            self._callback_stats.clear()
+
+    def stats(self) -> dict:
+        """Return usage statistics of the cache and the bytes saved by compression for each callback."""
+        with self._lock:
+            callbacks = {}
+            for callback, stats in self._callback_stats.items():
+                saved_bytes = stats["uncompressed_bytes"] - stats["sent_bytes"]
+                callbacks[callback] = {
+                    **stats,
+                    "saved_bytes": saved_bytes,
+                    "saved_fraction": (
+                        saved_bytes / stats["uncompressed_bytes"]
+                        if stats["uncompressed_bytes"]
+                        else None
+                    ),
+                }
+        return {"cache": self._responses.stats(), "callbacks": callbacks}
@@ -0,0 +1,141 @@
+"""
+Lightweight tracing of where the time goes in a callback request
+(e.g., filtering the data, building the figure, serializing and compressing the response).
+
+A sampled fraction (TRACE_SAMPLE_RATE, 0 by default) of the callback requests is traced, and each finished trace
+is appended to a JSON-lines file (TRACE_FILE), one span per line. The spans have the fields of OpenTelemetry spans:
+trace_id, span_id, parent_span_id, name, start_time_unix_nano, end_time_unix_nano and attributes.
+
+Outside of a sampled trace, a span only costs a context variable lookup.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+# Fraction of the callback requests to trace
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+
+SERVICE_NAME = "climate_emotions_map"
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+# Traces from all threads of a worker process are appended to the same file
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """The spans of a single request, with the stack of spans that are in progress."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._open_spans = []
+        self._last_end_time_ns = None
+
+    def start_span(self, name: str, attributes: dict) -> dict:
+        """Start a span as a child of the innermost span in progress."""
+        span = {
+            "trace_id": self.trace_id,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": (
+                self._open_spans[-1]["span_id"] if self._open_spans else None
+            ),
+            "name": name,
+            "start_time_unix_nano": time.time_ns(),
+            "end_time_unix_nano": None,
+            "attributes": attributes,
+        }
+        self.spans.append(span)
+        self._open_spans.append(span)
+        return span
+
+    def end_span(self, span: dict):
+        """End a span (and any of its children that are still in progress)."""
+        span["end_time_unix_nano"] = self._last_end_time_ns = time.time_ns()
+        while self._open_spans:
+            if self._open_spans.pop() is span:
+                break
+
+    def add_span_since_last_end(self, name: str, attributes: dict):
+        """
+        Add a span covering the time since the most recently ended span,
+        e.g. for work done by Dash between two instrumented points.
+        """
+        if self._last_end_time_ns is None:
+            return
+        span = self.start_span(name, attributes)
+        span["start_time_unix_nano"] = self._last_end_time_ns
+        self.end_span(span)
+
+    def write(self, file: str):
+        """Append the spans to a JSON-lines file."""
+        resource = {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+        lines = "".join(
+            json.dumps({**span, "resource": resource}) + "\n"
+            for span in self.spans
+        )
+        with _write_lock, open(file, "a") as f:
+            f.write(lines)
+
+
+def start_trace(name: str, **attributes) -> bool:
+    """Start tracing the current request if it is sampled (with a root span), and return whether it is traced."""
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+        # Do not leave the trace of a previous request on the same thread in place
+        _current_trace.set(None)
+        return False
+    trace = Trace()
+    trace.start_span(name, attributes)
+    _current_trace.set(trace)
+    return True
+
+
+def end_trace(**attributes):
+    """End the trace of the current request (if any), adding attributes to its root span, and write it out."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    _current_trace.set(None)
+    root_span = trace.spans[0]
+    root_span["attributes"].update(attributes)
+    trace.end_span(root_span)
+    trace.write(TRACE_FILE)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record the enclosed code as a span of the current trace (does nothing if the request is not traced)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    current_span = trace.start_span(name, attributes)
+    try:
+        yield
+    finally:
+        trace.end_span(current_span)
+
+
+def add_span_since_last_end(name: str, **attributes):
+    """Add a span covering the time since the most recently ended span of the current trace (if any)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span_since_last_end(name, attributes)
+
+
+def traced(func):
+    """Decorator to record each call of a function as a span of the current trace."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -1,6 +1,6 @@
 """Utility functions for the Climate Emotions Map app."""
 
-from .data_loader import DATA_DICTIONARIES, SURVEY_DATA
+from .data_loader import DATA_DICTIONARIES, NATIONAL_SAMPLE_SIZE, SURVEY_DATA
 
 DEFAULT_QUESTION = {
     "domain": "Climate emotions & beliefs",
@@ -84,6 +84,70 @@ def create_map_title(impact: str = None) -> str:
     return f"{SECTION_TITLES['map_impacts']}: {impact}"
 
 
+def get_sample_sizes() -> dict[str, int]:
+    """Get the sample size of each state."""
+    df = SURVEY_DATA["samplesizes_state.tsv"]
+    return dict(zip(df["state"], df["n"].astype(int)))
+
+
+def get_question_subtitles() -> dict[str, str]:
+    """Get the map subtitle for each option in the question dropdown."""
+    sq_df = DATA_DICTIONARIES["subquestion_dictionary.tsv"]
+    return {
+        f"{question}_{subquestion}": create_question_subtitle(
+            question, subquestion
+        )
+        for question, subquestion in zip(
+            sq_df["question"], sq_df["sub_question"]
+        )
+    }
+
+
+def create_drawer_state_text(state: str | None) -> str:
+    """Create the text naming the selected state (or the whole sample) in the sample characteristics drawer."""
+    if state is None:
+        return ALL_STATES_LABEL
+    return f"State: {state}"
+
+
+def create_sample_size_text(state: str | None) -> str:
+    """Create the text giving the sample size of the selected state (or the whole sample)."""
+    df = SURVEY_DATA["samplesizes_state.tsv"]
+    if state is None:
+        sample_size = NATIONAL_SAMPLE_SIZE
+    else:
+        sample_size = df[df["state"] == state]["n"].values[0]
+    return f"Sample size: {sample_size:,}"
+
+
+def create_selected_question_title(state: str | None) -> str:
+    """Create the title for the selected question bar plot based on the selected state."""
+    if state is None:
+        return ALL_STATES_LABEL
+    return state
+
+
+def create_all_questions_title(state: str | None) -> str:
+    """Create the title for the section for all questions based on the selected state."""
+    if state is None:
+        return f"{SECTION_TITLES['all_questions']}: {ALL_STATES_LABEL}"
+    return f"{SECTION_TITLES['all_questions']}: {state}"
+
+
+def get_threshold(show_all_responses_checked: bool) -> str | None:
+    """Get the endorsement threshold for the stacked bar plots based on whether all responses should be shown."""
+    if show_all_responses_checked:
+        return None
+    return DEFAULT_QUESTION["outcome"]
+
+
+def get_stacked_bar_plot_key(
+    state: str | None, stratify: bool, threshold: str | None
+) -> list:
+    """Get the (JSON-serializable) key identifying the stacked bar plots shown for a state and bar chart options."""
+    return [state, stratify, threshold]
+
+
 def create_question_subtitle(question: str, subquestion: str) -> str:
     """Get the full text to display for a question-subquestion pair as the subtitle for the map plot."""
     q_df = DATA_DICTIONARIES.get("question_dictionary.tsv")
@@ -0,0 +1,641 @@
+#!/usr/bin/env python
+"""
+Benchmark the server callbacks end to end, by replaying scripted user sessions
+(picking a state, toggling the party stratification, changing the question, choosing a weather event, ...)
+against the app through the Flask test client, without a browser.
+
+The requests are the ones the Dash renderer would send: the clientside callbacks that update the selected state
+and decide which figures to request (updateStateSelection and requestSelectionDependentOutputs
+in assets/clientside.js) are emulated, including the browser figure memo, and the chained callbacks are called in turn with the outputs of the previous ones.
+The latency percentiles and response sizes are reported for each callback.
+
+Example usage:
+    python code/benchmark_callbacks.py --sessions 20 --output callbacks.json
+    python code/benchmark_callbacks.py --sessions 20 --gzip
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Outputs that the server sends after the others (mirrors DEFERRED_OUTPUTS in app.py)
+DEFERRED_OUTPUTS = {"descriptive", "stacked"}
+
+# The user interactions a session is made of, in order
+SESSION_SCRIPT = [
+    "click_state",
+    "select_question",
+    "select_impact",
+    "toggle_show_all",
+    "switch_tab",
+    "click_state",
+    "select_question",
+    "toggle_party",
+    "switch_tab",
+    "toggle_show_all",
+]
+
+LAYOUT_REQUEST_NAME = "_dash-layout"
+
+
+class FlaskTransport:
+    """Send requests to the app in the same process through the Flask test client."""
+
+    def __init__(self, server, accept_gzip: bool):
+        self.client = server.test_client()
+        self.headers = {"Accept-Encoding": "gzip"} if accept_gzip else {}
+
+    def send(
+        self, method: str, path: str, body: dict | None = None
+    ) -> tuple[int, bytes, int, float]:
+        """Send a request and return the status, (decompressed) response body, bytes sent over the wire and latency in ms."""
+        start = time.perf_counter()
+        response = self.client.open(
+            path, method=method, json=body, headers=self.headers
+        )
+        content = response.get_data()
+        latency_ms = (time.perf_counter() - start) * 1000
+        sent_bytes = len(content)
+        if response.headers.get("Content-Encoding") == "gzip":
+            content = gzip.decompress(content)
+        return response.status_code, content, sent_bytes, latency_ms
+
+
+def find_components(layout, predicate) -> list[dict]:
+    """Return the props of all components in a serialized layout for which the predicate (on the props) is true."""
+    if isinstance(layout, list):
+        return [
+            props
+            for item in layout
+            for props in find_components(item, predicate)
+        ]
+    if not isinstance(layout, dict):
+        return []
+    found = []
+    if "props" in layout and "type" in layout:
+        if predicate(layout["props"]):
+            found.append(layout["props"])
+        layout = layout["props"]
+    for value in layout.values():
+        found.extend(find_components(value, predicate))
+    return found
+
+
+def parse_outputs(output: str) -> list[tuple[str, str]]:
+    """Return the (id, property) of each output of a callback from its output string."""
+    if output.startswith(".."):
+        outputs = output[2:-2].split("...")
+    else:
+        outputs = [output]
+    return [tuple(item.rsplit(".", 1)) for item in outputs]
+
+
+class CallbackClient:
+    """Send callback requests the way the Dash renderer does, and record the latency and size of the responses."""
+
+    def __init__(self, transport, callback_names: dict[str, str] = None):
+        self.transport = transport
+        self.callback_names = callback_names or {}
+        self.records = []
+
+        self.layout = json.loads(self.request("GET", "/_dash-layout"))
+        dependencies = json.loads(
+            self.request("GET", "/_dash-dependencies", record=False)
+        )
+        # The server callbacks, keyed on the ID of their first input
+        self.callbacks = {
+            dependency["inputs"][0]["id"]: dependency
+            for dependency in dependencies
+            if not dependency.get("clientside_function")
+        }
+        self.components = {
+            (
+                props["id"]
+                if isinstance(props["id"], str)
+                else json.dumps(props["id"], sort_keys=True)
+            ): props
+            for props in find_components(
+                self.layout, lambda props: "id" in props
+            )
+        }
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: dict | None = None,
+        name: str | None = None,
+        record: bool = True,
+    ) -> bytes | None:
+        """Send a request and record it, returning the response body (or None if there is no content)."""
+        try:
+            status, content, sent_bytes, latency_ms = self.transport.send(
+                method, path, body
+            )
+            error = status >= 400
+            error_type = f"HTTP {status}" if error else None
+        except OSError as exception:
+            # e.g., the connection was refused or the request timed out
+            status, content, sent_bytes, latency_ms = None, b"", 0, None
+            error = True
+            error_type = type(exception).__name__
+        if record:
+            self.records.append(
+                {
+                    "name": name or LAYOUT_REQUEST_NAME,
+                    "status": status,
+                    "error": error,
+                    "error_type": error_type,
+                    "latency_ms": latency_ms,
+                    "response_bytes": len(content),
+                    "sent_bytes": sent_bytes,
+                }
+            )
+        if error or status == 204:
+            return None
+        return content
+
+    def get_initial_value(self, component_id: str, prop: str):
+        """Return the value of a property of a component in the initial layout."""
+        return self.components[component_id].get(prop)
+
+    def expand_dependency(self, dependency: dict, value=None) -> dict | list:
+        """Return the request entry of an input, state or output, expanding pattern-matching IDs to the matching components."""
+        if not dependency["id"].startswith("{"):
+            return {
+                "id": dependency["id"],
+                "property": dependency["property"],
+                "value": value,
+            }
+        pattern = json.loads(dependency["id"])
+        return [
+            {"id": props["id"], "property": dependency["property"]}
+            for props in self.components.values()
+            if isinstance(props["id"], dict)
+            and props["id"].keys() == pattern.keys()
+            and all(
+                props["id"][key] == pattern_value
+                for key, pattern_value in pattern.items()
+                if pattern_value != ["ALL"]
+            )
+        ]
+
+    def call(
+        self, first_input_id: str, values: dict, changed: list[str]
+    ) -> dict | None:
+        """
+        Call the server callback with the given first input, with values keyed on "<id>.<property>",
+        and return its outputs keyed the same way (or None if the callback did not update anything).
+        """
+        dependency = self.callbacks[first_input_id]
+        outputs = [
+            self.expand_dependency({"id": output_id, "property": prop})
+            for output_id, prop in parse_outputs(dependency["output"])
+        ]
+        body = {
+            "output": dependency["output"],
+            "outputs": (
+                outputs
+                if dependency["output"].startswith("..")
+                else outputs[0]
+            ),
+            "inputs": [
+                self.expand_dependency(
+                    item, values.get(f"{item['id']}.{item['property']}")
+                )
+                for item in dependency["inputs"]
+            ],
+            "state": [
+                self.expand_dependency(
+                    item, values.get(f"{item['id']}.{item['property']}")
+                )
+                for item in dependency["state"]
+            ],
+            "changedPropIds": changed,
+        }
+        content = self.request(
+            "POST",
+            "/_dash-update-component",
+            body,
+            name=self.callback_names.get(
+                dependency["output"], dependency["output"]
+            ),
+        )
+        if content is None:
+            return None
+        return {
+            f"{output_id}.{prop}": value
+            for output_id, props in json.loads(content)["response"].items()
+            for prop, value in props.items()
+        }
+
+
+class Session:
+    """A simulated user, whose interactions trigger the same server callbacks as in the browser."""
+
+    def __init__(self, client: CallbackClient, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.values = {
+            key: client.get_initial_value(*key.rsplit(".", 1))
+            for key in [
+                "state-select.value",
+                "question-select.value",
+                "impact-select.value",
+                "party-stratify-switch.checked",
+                "response-threshold-control.checked",
+                "domain-tabs.value",
+                "stacked-bar-plot-keys.data",
+                "figure-memo-config.data",
+            ]
+        }
+        self.values["us-map.clickData"] = None
+        self.options = {
+            key: [
+                item["value"]
+                for option in client.get_initial_value(key, "data")
+                for item in option.get("items", [option])
+            ]
+            for key in ["state-select", "question-select", "impact-select"]
+        }
+        self.domains = sorted(
+            {
+                props["id"]["domain"]
+                for props in client.components.values()
+                if isinstance(props["id"], dict)
+                and props["id"].get("type") == "stacked-bar-plot"
+            }
+        )
+        # Emulates PENDING_SELECTION in assets/clientside.js (the latest selection request and the callback working on it)
+        self.pending = {"seq": 0, "keys": [], "callback": None}
+        # Emulates the figure memo in the browser, which memoizes the initial figures of the layout on page load
+        # (memoizeFigures in assets/clientside.js)
+        self.memo = OrderedDict()
+        self.memoize({"outputs": self.get_memo_keys()})
+
+    def memoize(self, figure_memo_keys: dict | None):
+        """Add the figures with the given memo keys to the emulated browser memo."""
+        if not figure_memo_keys:
+            return
+        if all(
+            key in self.pending["keys"]
+            for key in figure_memo_keys["outputs"].values()
+        ):
+            # The deferred figures for the latest selection may still be on their way
+            self.pending["callback"] = (
+                "deferred" if figure_memo_keys.get("deferred") else None
+            )
+        max_entries = self.values["figure-memo-config.data"]["max_entries"]
+        for key in figure_memo_keys["outputs"].values():
+            self.memo.pop(key, None)
+            self.memo[key] = True
+            while len(self.memo) > max_entries:
+                self.memo.popitem(last=False)
+
+    def get_memo_keys(self) -> dict[str, str]:
+        """Emulate getFigureMemoKeys, returning the memo key of each figure for the current selection."""
+        state = self.values["state-select.value"]
+        question_value = self.values["question-select.value"]
+        stratify = self.values["party-stratify-switch.checked"]
+        domain = self.values["domain-tabs.value"]
+        threshold = (
+            None
+            if self.values["response-threshold-control.checked"]
+            else self.values["figure-memo-config.data"]["default_threshold"]
+        )
+        memo_keys = {
+            "descriptive": ["descriptive", state],
+            "map": [
+                "map",
+                question_value,
+                state,
+                self.values["impact-select.value"],
+            ],
+            "selected": [
+                "selected",
+                question_value,
+                state,
+                stratify,
+                threshold,
+            ],
+            "stacked": ["stacked", domain, state, stratify, threshold],
+        }
+        return {
+            name: json.dumps(memo_key, separators=(",", ":"))
+            for name, memo_key in memo_keys.items()
+        }
+
+    def update_state(self, changed: str):
+        """Emulate updateStateSelection (a clientside callback) updating the state selection and the party switch."""
+        state_key = "state-select.value"
+        stratify_key = "party-stratify-switch.checked"
+        if changed == "us-map.clickData":
+            if self.values[stratify_key]:
+                return []
+            clicked_state = self.values["us-map.clickData"]["points"][0][
+                "customdata"
+            ][0]
+            new_state = (
+                None
+                if clicked_state == self.values[state_key]
+                else clicked_state
+            )
+        elif changed == stratify_key:
+            # Deselect any state
+            new_state = None
+        else:
+            return []
+        if new_state == self.values[state_key]:
+            return []
+        self.values[state_key] = new_state
+        return [state_key]
+
+    def request_figures(self, triggered: list[str]):
+        """Emulate requestSelectionDependentOutputs and the chained server callbacks it triggers."""
+        triggered_ids = {key.split(".")[0] for key in triggered}
+        state = self.values["state-select.value"]
+        question_value = self.values["question-select.value"]
+        impact = self.values["impact-select.value"]
+        stratify = self.values["party-stratify-switch.checked"]
+        show_all = self.values["response-threshold-control.checked"]
+        domain = self.values["domain-tabs.value"]
+        config = self.values["figure-memo-config.data"]
+        threshold = None if show_all else config["default_threshold"]
+        stacked_bar_plot_key = [state, stratify, threshold]
+
+        needed = []
+        if "state-select" in triggered_ids:
+            needed.append("descriptive")
+        if triggered_ids & {
+            "state-select",
+            "question-select",
+            "impact-select",
+        }:
+            needed.append("map")
+        if triggered_ids & {
+            "state-select",
+            "question-select",
+            "party-stratify-switch",
+            "response-threshold-control",
+        }:
+            needed.append("selected")
+        stacked_bar_plot_keys = self.values["stacked-bar-plot-keys.data"]
+        if stacked_bar_plot_keys.get(domain) != stacked_bar_plot_key:
+            needed.append("stacked")
+
+        memo_keys = self.get_memo_keys()
+        missing = {}
+        for name in needed:
+            memo_key = memo_keys[name]
+            if memo_key in self.memo:
+                self.memo.move_to_end(memo_key)
+                if name == "stacked":
+                    stacked_bar_plot_keys[domain] = stacked_bar_plot_key
+            else:
+                missing[name] = memo_key
+
+        self.pending["seq"] += 1
+        selection = {
+            "seq": self.pending["seq"],
+            "state": state,
+            "question_value": question_value,
+            "impact": impact,
+            "stratify": stratify,
+            "show_all": show_all,
+            "domain": domain,
+            "outputs": missing,
+        }
+        request = deferred_request = None
+        if missing:
+            if set(missing) <= DEFERRED_OUTPUTS:
+                deferred_request = selection
+            else:
+                request = selection
+        # Cancel the response for an earlier selection that is still on its way (empty outputs)
+        if self.pending["callback"] == "request" and request is None:
+            request = {**selection, "outputs": {}}
+        elif (
+            self.pending["callback"] == "deferred" and deferred_request is None
+        ):
+            deferred_request = {**selection, "outputs": {}}
+        self.pending["keys"] = list(missing.values())
+        if request is not None and request["outputs"]:
+            self.pending["callback"] = "request"
+        elif deferred_request is not None and deferred_request["outputs"]:
+            self.pending["callback"] = "deferred"
+        else:
+            self.pending["callback"] = None
+
+        if request is not None:
+            # Both requests are sent at the same time by the browser, the deferred one can only be a cancellation
+            if deferred_request is not None:
+                self.request_deferred_figures(deferred_request)
+            outputs = self.client.call(
+                "selection-request",
+                {"selection-request.data": request},
+                ["selection-request.data"],
+            )
+            if outputs is None:
+                return
+            self.memoize(outputs.get("figure-memo-keys.data"))
+            deferred_request = outputs.get("deferred-selection-request.data")
+        if deferred_request is not None:
+            self.request_deferred_figures(deferred_request)
+
+    def request_deferred_figures(self, deferred_request: dict):
+        """Emulate the deferred server callback, triggered by the deferred-selection-request store."""
+        stacked_bar_plot_keys = self.values["stacked-bar-plot-keys.data"]
+        outputs = self.client.call(
+            "deferred-selection-request",
+            {
+                "deferred-selection-request.data": deferred_request,
+                "stacked-bar-plot-keys.data": stacked_bar_plot_keys,
+            },
+            ["deferred-selection-request.data"],
+        )
+        if outputs is None:
+            return
+        self.memoize(outputs.get("figure-memo-keys.data"))
+        if "stacked-bar-plot-keys.data" in outputs:
+            self.values["stacked-bar-plot-keys.data"] = outputs[
+                "stacked-bar-plot-keys.data"
+            ]
+
+    def click_state(self):
+        """Click on a state in the map."""
+        state = self.rng.choice(self.options["state-select"])
+        self.values["us-map.clickData"] = {"points": [{"customdata": [state]}]}
+        self.request_figures(self.update_state("us-map.clickData"))
+
+    def toggle_party(self):
+        """Toggle the party stratification switch."""
+        key = "party-stratify-switch.checked"
+        self.values[key] = not self.values[key]
+        triggered = [key] + self.update_state(key)
+        self.request_figures(triggered)
+
+    def select_question(self):
+        """Select another question (which resets the weather event selection)."""
+        self.values["question-select.value"] = self.rng.choice(
+            self.options["question-select"]
+        )
+        triggered = ["question-select.value"]
+        if self.values["impact-select.value"] is not None:
+            self.values["impact-select.value"] = None
+            triggered.append("impact-select.value")
+        self.request_figures(triggered)
+
+    def select_impact(self):
+        """Select a weather event to show on the map."""
+        self.values["impact-select.value"] = self.rng.choice(
+            self.options["impact-select"]
+        )
+        self.request_figures(["impact-select.value"])
+
+    def toggle_show_all(self):
+        """Toggle the switch to show all responses."""
+        key = "response-threshold-control.checked"
+        self.values[key] = not self.values[key]
+        self.request_figures([key])
+
+    def switch_tab(self):
+        """Switch to another domain tab."""
+        self.values["domain-tabs.value"] = self.rng.choice(
+            [
+                domain
+                for domain in self.domains
+                if domain != self.values["domain-tabs.value"]
+            ]
+        )
+        self.request_figures(["domain-tabs.value"])
+
+    def run(self, script: list[str] = SESSION_SCRIPT):
+        """Perform the interactions of a script in order."""
+        for interaction in script:
+            getattr(self, interaction)()
+
+
+def get_callback_names(app) -> dict[str, str]:
+    """Return the name of the function of each server callback, keyed on its output string."""
+    return {
+        output: callback["callback"].__name__
+        for output, callback in app.callback_map.items()
+        if "callback" in callback
+    }
+
+
+def get_percentile(values: list[float], percentile: float) -> float | None:
+    """Return a percentile of a list of values (or None if there are no values)."""
+    if not values:
+        return None
+    return float(np.percentile(values, percentile))
+
+
+def summarize_records(records: list[dict]) -> dict:
+    """Return the latency percentiles and response sizes of the recorded requests, for each callback."""
+    summary = {}
+    for name in dict.fromkeys(record["name"] for record in records):
+        named_records = [
+            record for record in records if record["name"] == name
+        ]
+        latencies = [
+            record["latency_ms"]
+            for record in named_records
+            if record["latency_ms"] is not None
+        ]
+        response_bytes = [record["response_bytes"] for record in named_records]
+        sent_bytes = [record["sent_bytes"] for record in named_records]
+        summary[name] = {
+            "requests": len(named_records),
+            "errors": sum(record["error"] for record in named_records),
+            "p50_ms": get_percentile(latencies, 50),
+            "p95_ms": get_percentile(latencies, 95),
+            "p99_ms": get_percentile(latencies, 99),
+            "mean_ms": np.mean(latencies) if latencies else None,
+            "total_ms": sum(latencies),
+            "mean_response_bytes": np.mean(response_bytes),
+            "max_response_bytes": max(response_bytes),
+            "mean_sent_bytes": np.mean(sent_bytes),
+        }
+    return summary
+
+
+def format_ms(value: float | None) -> str:
+    """Format a latency in milliseconds (which is None if no request got a response)."""
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_summary(summary: dict):
+    """Print the summary of each callback, by decreasing total time."""
+    print(
+        f"{'callback':<70} {'requests':>8} {'errors':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+        f"{'total (s)':>9} {'mean size (kB)':>14} {'mean sent (kB)':>14}"
+    )
+    for name, stats in sorted(
+        summary.items(), key=lambda item: -item[1]["total_ms"]
+    ):
+        print(
+            f"{name[:70]:<70} {stats['requests']:>8} {stats['errors']:>6} {format_ms(stats['p50_ms']):>9} "
+            f"{format_ms(stats['p95_ms']):>9} {format_ms(stats['p99_ms']):>9} {stats['total_ms'] / 1000:>9.2f} "
+            f"{stats['mean_response_bytes'] / 1000:>14.1f} {stats['mean_sent_bytes'] / 1000:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=10,
+        help="Number of user sessions to replay (default: 10)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the random choices of the sessions (default: 0)",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Accept gzip-compressed responses, like a browser (which also uses the cache of compressed responses)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the summary and all recorded requests to",
+    )
+    args = parser.parse_args()
+
+    from climate_emotions_map.app import app  # noqa
+
+    rng = random.Random(args.seed)
+    records = []
+    for _ in range(args.sessions):
+        # Every session loads the page, like a new browser tab
+        client = CallbackClient(
+            FlaskTransport(app.server, accept_gzip=args.gzip)
+        )
+        # NOTE: The callbacks are only registered with the app once it has handled its first request
+        client.callback_names = get_callback_names(app)
+        Session(client, rng).run()
+        records.extend(client.records)
+
+    summary = summarize_records(records)
+    print_summary(summary)
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps({"summary": summary, "records": records}, indent=2)
+        )
+        print(f"Wrote the results to {args.output}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Compare the time taken to make the sample descriptive plots by building the whole figure
+(the original implementation) vs. by filling the data into a copy of the cached template figure.
+
+Example usage:
+    python code/benchmark_descriptive_plots.py --repeats 20
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from climate_emotions_map.make_descriptive_plots import (  # noqa
+    SAMPLEDESC_STATE,
+    make_descriptive_plots,
+)
+from climate_emotions_map.utility import NUM_DECIMALS  # noqa
+
+
+def time_descriptive_plots(
+    state: str | None, use_template: bool, repeats: int
+):
+    """Return the mean time (in seconds) taken to make the descriptive plots for a state."""
+    return (
+        timeit.timeit(
+            lambda: make_descriptive_plots(
+                state=state, decimals=NUM_DECIMALS, use_template=use_template
+            ),
+            number=repeats,
+        )
+        / repeats
+    )
+
+
+def check_figures_match(state: str | None) -> bool:
+    """Check that both implementations produce the same figure for a state."""
+    return json.loads(
+        make_descriptive_plots(state=state, use_template=True).to_json()
+    ) == json.loads(
+        make_descriptive_plots(state=state, use_template=False).to_json()
+    )
+
+
+def run_benchmark(states: list[str | None], repeats: int) -> list[dict]:
+    """Time both implementations for each state."""
+    # Build the template outside of the timed calls
+    make_descriptive_plots(state=None, decimals=NUM_DECIMALS)
+
+    results = []
+    for state in states:
+        full_build = time_descriptive_plots(state, False, repeats)
+        from_template = time_descriptive_plots(state, True, repeats)
+        results.append(
+            {
+                "state": state,
+                "full_build_ms": full_build * 1000,
+                "from_template_ms": from_template * 1000,
+                "speedup": full_build / from_template,
+                "figures_match": check_figures_match(state),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=10,
+        help="Number of times to make each figure (default: 10)",
+    )
+    parser.add_argument(
+        "--n-states",
+        type=int,
+        default=3,
+        help="Number of states to benchmark in addition to the whole sample (default: 3)",
+    )
+    args = parser.parse_args()
+
+    states = [None] + SAMPLEDESC_STATE["state"].unique().tolist()[
+        : args.n_states
+    ]
+    results = run_benchmark(states, args.repeats)
+
+    print(
+        f"{'state':<45} {'full build (ms)':>16} {'from template (ms)':>19} {'speedup':>8} {'match':>6}"
+    )
+    for result in results:
+        print(
+            f"{str(result['state']):<45} {result['full_build_ms']:>16.2f} "
+            f"{result['from_template_ms']:>19.2f} {result['speedup']:>7.1f}x {str(result['figures_match']):>6}"
+        )
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+Time the functions that build the figures of the app (make_map, make_stacked_bar, make_descriptive_plots)
+and get_state_abbrevs_in_long_format, for a representative set of inputs.
+
+The results are written to a JSON file (along with the git commit they were run at),
+and can be compared with the results of a previous run to see how a change affects each case.
+
+Example usage:
+    python code/benchmark_figures.py --output before.json
+    (make some changes)
+    python code/benchmark_figures.py --output after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from climate_emotions_map.make_descriptive_plots import (  # noqa
+    SAMPLEDESC_STATE,
+    make_descriptive_plots,
+)
+from climate_emotions_map.make_map import (  # noqa
+    get_state_abbrevs_in_long_format,
+    make_map,
+)
+from climate_emotions_map.make_stacked_bar_plots import (  # noqa
+    make_stacked_bar,
+)
+from climate_emotions_map.utility import (  # noqa
+    DEFAULT_QUESTION,
+    NUM_DECIMALS,
+    get_impact_options,
+)
+
+REPO_DIR = Path(__file__).parents[1]
+
+
+def get_benchmark_cases(n_states: int) -> dict:
+    """Return the functions to time, keyed on the name of each case."""
+    question = DEFAULT_QUESTION["question"]
+    subquestion = DEFAULT_QUESTION["sub_question"]
+    states = SAMPLEDESC_STATE["state"].unique().tolist()[:n_states]
+    clicked_state = states[0]
+    impact = get_impact_options()[0]["value"]
+
+    map_kwargs = {
+        "question": question,
+        "sub_question": subquestion,
+        "outcome": DEFAULT_QUESTION["outcome"],
+        "decimals": NUM_DECIMALS,
+    }
+    cases = {
+        "make_map": partial(make_map, **map_kwargs),
+        "make_map[impact]": partial(make_map, **map_kwargs, impact=impact),
+        "make_map[clicked_state]": partial(
+            make_map, **map_kwargs, clicked_state=clicked_state
+        ),
+        "make_map[impact, clicked_state]": partial(
+            make_map, **map_kwargs, impact=impact, clicked_state=clicked_state
+        ),
+    }
+
+    stacked_bar_kwargs = {"question": question, "decimals": NUM_DECIMALS}
+    cases.update(
+        {
+            "make_stacked_bar": partial(
+                make_stacked_bar, **stacked_bar_kwargs, subquestion=subquestion
+            ),
+            "make_stacked_bar[all]": partial(
+                make_stacked_bar, **stacked_bar_kwargs, subquestion="all"
+            ),
+            "make_stacked_bar[stratify]": partial(
+                make_stacked_bar,
+                **stacked_bar_kwargs,
+                subquestion=subquestion,
+                stratify=True,
+            ),
+            "make_stacked_bar[threshold]": partial(
+                make_stacked_bar,
+                **stacked_bar_kwargs,
+                subquestion=subquestion,
+                threshold=DEFAULT_QUESTION["outcome"],
+            ),
+            "make_stacked_bar[all, stratify, threshold]": partial(
+                make_stacked_bar,
+                **stacked_bar_kwargs,
+                subquestion="all",
+                stratify=True,
+                threshold=DEFAULT_QUESTION["outcome"],
+            ),
+            "make_stacked_bar[state]": partial(
+                make_stacked_bar,
+                **stacked_bar_kwargs,
+                subquestion=subquestion,
+                state=clicked_state,
+            ),
+        }
+    )
+
+    cases["make_descriptive_plots"] = partial(
+        make_descriptive_plots, decimals=NUM_DECIMALS
+    )
+    for state in states:
+        cases[f"make_descriptive_plots[{state}]"] = partial(
+            make_descriptive_plots, state=state, decimals=NUM_DECIMALS
+        )
+
+    cases["get_state_abbrevs_in_long_format"] = (
+        get_state_abbrevs_in_long_format
+    )
+    return cases
+
+
+def time_case(func, repeats: int, number: int) -> dict:
+    """Return summary statistics (in milliseconds) of the time taken by one call to a function."""
+    # make_stacked_bar prints debugging information, which would clutter the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm up any caches (e.g., the descriptive plots template) outside of the timed calls
+        func()
+        times_ms = [
+            total / number * 1000
+            for total in timeit.repeat(func, repeat=repeats, number=number)
+        ]
+    return {
+        "min_ms": min(times_ms),
+        "median_ms": statistics.median(times_ms),
+        "mean_ms": statistics.mean(times_ms),
+        "stdev_ms": statistics.stdev(times_ms) if repeats > 1 else 0.0,
+        "repeats": repeats,
+        "number": number,
+    }
+
+
+def get_git_commit() -> str | None:
+    """Return the commit the repository is at (or None if it cannot be determined)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    repeats: int, number: int, n_states: int, pattern: str | None
+) -> dict:
+    """Time all benchmark cases (whose name contains the pattern, if given)."""
+    results = {}
+    for name, func in get_benchmark_cases(n_states).items():
+        if pattern is not None and pattern not in name:
+            continue
+        results[name] = time_case(func, repeats=repeats, number=number)
+        print(f"{name:<50} {results[name]['median_ms']:>10.2f} ms")
+    return {
+        "commit": get_git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def print_comparison(baseline: dict, current: dict):
+    """Print the change in median time of each case relative to a baseline run."""
+    print(
+        f"\nComparison with {baseline.get('commit')} ({baseline.get('date')}):"
+    )
+    print(
+        f"{'case':<50} {'baseline (ms)':>14} {'current (ms)':>13} {'change':>8}"
+    )
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<50} {'-':>14} {result['median_ms']:>13.2f}")
+            continue
+        baseline_ms = baseline["results"][name]["median_ms"]
+        change = result["median_ms"] / baseline_ms - 1
+        print(
+            f"{name:<50} {baseline_ms:>14.2f} {result['median_ms']:>13.2f} {change:>+8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="Number of timed repeats of each case (default: 5)",
+    )
+    parser.add_argument(
+        "--number",
+        type=int,
+        default=3,
+        help="Number of calls per repeat (default: 3)",
+    )
+    parser.add_argument(
+        "--n-states",
+        type=int,
+        default=2,
+        help="Number of states (or clusters) to make the descriptive plots for, in addition to the whole sample (default: 2)",
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        default=None,
+        help="Only run the cases whose name contains this string",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the results to",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="JSON file with the results of a previous run to compare with",
+    )
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(
+        repeats=args.repeats,
+        number=args.number,
+        n_states=args.n_states,
+        pattern=args.filter,
+    )
+    if args.output is not None:
+        args.output.write_text(json.dumps(benchmark, indent=2))
+        print(f"Wrote the results to {args.output}")
+    if args.compare is not None:
+        print_comparison(json.loads(args.compare.read_text()), benchmark)
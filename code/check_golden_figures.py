@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+Check that the figure builders (make_map, make_stacked_bar, make_descriptive_plots) still produce the same figures
+as stored golden snapshots, e.g. to verify that a performance optimization does not change the charts.
+
+The figures are rendered for a representative matrix of inputs (questions of each domain, subquestions,
+states, party stratification, thresholds, impacts, clicked states, with and without the descriptive plots template),
+and their JSON is compared with the snapshots key by key, with a tolerance for floating point numbers.
+The snapshots are written with --update, typically before making a change.
+
+Example usage:
+    python code/check_golden_figures.py --update
+    (make some changes)
+    python code/check_golden_figures.py
+    python code/check_golden_figures.py --filter make_map --rel-tol 1e-6
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import math
+import re
+import sys
+from functools import partial
+from itertools import product
+from pathlib import Path
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from climate_emotions_map.data_loader import DATA_DICTIONARIES  # noqa
+from climate_emotions_map.layout import (  # noqa
+    MAP_LAYOUT,
+    SINGLE_SUBQUESTION_FIG_KW,
+)
+from climate_emotions_map.make_descriptive_plots import (  # noqa
+    SAMPLEDESC_STATE,
+    make_descriptive_plots,
+)
+from climate_emotions_map.make_map import make_map  # noqa
+from climate_emotions_map.make_stacked_bar_plots import (  # noqa
+    make_stacked_bar,
+)
+from climate_emotions_map.utility import (  # noqa
+    DEFAULT_QUESTION,
+    NUM_DECIMALS,
+    get_impact_options,
+)
+
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parents[1] / "golden_figures"
+
+
+def get_golden_cases(n_states: int) -> dict:
+    """Return the functions rendering the figures to check, keyed on the name of each case."""
+    questions_df = DATA_DICTIONARIES["question_dictionary.tsv"]
+    subquestions_df = DATA_DICTIONARIES["subquestion_dictionary.tsv"]
+    # The default question and the first question of each domain
+    questions = [DEFAULT_QUESTION["question"]] + [
+        question
+        for question in questions_df.groupby("domain_short", sort=False)[
+            "question"
+        ].first()
+        if question != DEFAULT_QUESTION["question"]
+    ]
+    states = SAMPLEDESC_STATE["state"].unique().tolist()[:n_states]
+    threshold = DEFAULT_QUESTION["outcome"]
+
+    cases = {}
+    for question in questions:
+        subquestion = subquestions_df.loc[
+            subquestions_df["question"] == question, "sub_question"
+        ].iloc[0]
+
+        for impact, clicked_state in product(
+            [None, get_impact_options()[0]["value"]], [None, *states[:1]]
+        ):
+            cases[
+                f"make_map[{question}_{subquestion}, impact={impact}, clicked_state={clicked_state}]"
+            ] = partial(
+                make_map,
+                question=question,
+                sub_question=subquestion,
+                outcome=threshold,
+                clicked_state=clicked_state,
+                impact=impact,
+                colormap_range_padding=MAP_LAYOUT["colormap_range_padding"],
+                margins=MAP_LAYOUT["margin"],
+                decimals=NUM_DECIMALS,
+            )
+
+        # The app stratifies by party for the whole sample only
+        for subquestion_option, (state, stratify), threshold_option in product(
+            [subquestion, "all"],
+            [
+                (None, False),
+                (None, True),
+                *[(state, False) for state in states],
+            ],
+            [None, threshold],
+        ):
+            cases[
+                f"make_stacked_bar[{question}_{subquestion_option}, state={state}, "
+                f"stratify={stratify}, threshold={threshold_option}]"
+            ] = partial(
+                make_stacked_bar,
+                question=question,
+                subquestion=subquestion_option,
+                state=state,
+                stratify=stratify,
+                threshold=threshold_option,
+                decimals=NUM_DECIMALS,
+                fig_kw=(
+                    SINGLE_SUBQUESTION_FIG_KW
+                    if subquestion_option != "all"
+                    else None
+                ),
+            )
+
+    for state, use_template in product([None, *states], [True, False]):
+        cases[
+            f"make_descriptive_plots[state={state}, use_template={use_template}]"
+        ] = partial(
+            make_descriptive_plots,
+            state=state,
+            decimals=NUM_DECIMALS,
+            use_template=use_template,
+        )
+    return cases
+
+
+def render_figure(func) -> dict:
+    """Render a figure and return its JSON representation as plain Python objects."""
+    # make_stacked_bar prints debugging information, which would clutter the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        figure = func()
+    # Round-trip through JSON so that numpy arrays, NaNs, etc. are represented as in the app's responses
+    return json.loads(figure.to_json())
+
+
+def get_snapshot_path(snapshot_dir: Path, name: str) -> Path:
+    """Return the snapshot file of a case."""
+    slug = re.sub(r"[^\w+-]+", "_", name).strip("_")
+    return snapshot_dir / f"{slug}.json.gz"
+
+
+def compare_json(
+    expected,
+    actual,
+    rel_tol: float,
+    abs_tol: float,
+    path: str = "",
+) -> list[str]:
+    """Return the differences between two JSON objects, with a tolerance for numbers (key order does not matter)."""
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        equal = expected is actual
+    elif isinstance(expected, (int, float)) and isinstance(
+        actual, (int, float)
+    ):
+        equal = math.isclose(
+            expected, actual, rel_tol=rel_tol, abs_tol=abs_tol
+        )
+    elif isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in sorted(expected.keys() | actual.keys()):
+            if key not in actual:
+                differences.append(f"{path}.{key}: missing")
+            elif key not in expected:
+                differences.append(f"{path}.{key}: unexpected")
+            else:
+                differences.extend(
+                    compare_json(
+                        expected[key],
+                        actual[key],
+                        rel_tol=rel_tol,
+                        abs_tol=abs_tol,
+                        path=f"{path}.{key}",
+                    )
+                )
+        return differences
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(actual)} instead of {len(expected)}"]
+        differences = []
+        for i, (expected_item, actual_item) in enumerate(
+            zip(expected, actual)
+        ):
+            differences.extend(
+                compare_json(
+                    expected_item,
+                    actual_item,
+                    rel_tol=rel_tol,
+                    abs_tol=abs_tol,
+                    path=f"{path}[{i}]",
+                )
+            )
+        return differences
+    else:
+        equal = expected == actual
+    return [] if equal else [f"{path}: {actual!r} instead of {expected!r}"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Write the current figures as the golden snapshots instead of checking them",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        default=DEFAULT_SNAPSHOT_DIR,
+        help=f"Directory of the golden snapshots (default: {DEFAULT_SNAPSHOT_DIR})",
+    )
+    parser.add_argument(
+        "--n-states",
+        type=int,
+        default=2,
+        help="Number of states (or clusters) to render the figures for, in addition to the whole sample (default: 2)",
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        default=None,
+        help="Only check the cases whose name contains this string",
+    )
+    parser.add_argument(
+        "--rel-tol",
+        type=float,
+        default=1e-9,
+        help="Relative tolerance for comparing numbers (default: 1e-9)",
+    )
+    parser.add_argument(
+        "--abs-tol",
+        type=float,
+        default=1e-12,
+        help="Absolute tolerance for comparing numbers (default: 1e-12)",
+    )
+    parser.add_argument(
+        "--max-differences",
+        type=int,
+        default=10,
+        help="Maximum number of differences to print for each case (default: 10)",
+    )
+    args = parser.parse_args()
+
+    cases = {
+        name: func
+        for name, func in get_golden_cases(args.n_states).items()
+        if args.filter is None or args.filter in name
+    }
+    args.snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    failed = []
+    for name, func in cases.items():
+        figure = render_figure(func)
+        snapshot_path = get_snapshot_path(args.snapshot_dir, name)
+
+        if args.update:
+            snapshot_path.write_bytes(
+                gzip.compress(
+                    json.dumps(figure, sort_keys=True).encode("utf-8")
+                )
+            )
+            print(f"Updated  {name}")
+            continue
+
+        if not snapshot_path.exists():
+            print(f"MISSING  {name}")
+            failed.append(name)
+            continue
+
+        differences = compare_json(
+            json.loads(gzip.decompress(snapshot_path.read_bytes())),
+            figure,
+            rel_tol=args.rel_tol,
+            abs_tol=args.abs_tol,
+        )
+        if differences:
+            print(f"CHANGED  {name} ({len(differences)} differences)")
+            for difference in differences[: args.max_differences]:
+                print(f"    {difference}")
+            failed.append(name)
+        else:
+            print(f"OK       {name}")
+
+    if args.update:
+        print(f"\nWrote {len(cases)} snapshots to {args.snapshot_dir}")
+    elif failed:
+        sys.exit(
+            f"\n{len(failed)} of {len(cases)} figures do not match the golden snapshots"
+        )
+    else:
+        print(f"\nAll {len(cases)} figures match the golden snapshots")
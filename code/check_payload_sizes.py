@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Report the serialized size of the callback responses of the app, by callback, output, figure trace and
+figure layout property, and check them against per-callback byte budgets.
+
+The responses are collected by replaying the scripted user sessions of benchmark_callbacks.py against the app
+through the Flask test client (with a fixed seed, so that the same figures are requested on every run).
+The sizes are those of the uncompressed JSON, which drives both the time the browser takes to render
+the figures and, once compressed, the bandwidth used.
+
+A budget is a JSON file with the maximum size in bytes of the responses of each callback
+and/or of each of their outputs or figure parts as named in the report (the largest size over all sessions
+is checked), e.g.:
+    {"update_selection_dependent_outputs": {"response": 1500000, "us-map.figure": 1200000},
+     "_dash-layout": {"response": 400000}}
+It can be written from the current sizes with --write-budget, and the script then exits with an error
+if a later run exceeds it.
+
+The committed budget (code/payload_budget.json) is checked in CI (see .github/workflows/check_payload_sizes.yml)
+against the synthetic dataset made by create_synthetic_data.py with its default arguments,
+since the data submodule is private. Rewrite it with the same dataset when a payload is meant to grow.
+
+Example usage:
+    python code/check_payload_sizes.py
+    python code/check_payload_sizes.py --budget code/payload_budget.json
+    python code/create_synthetic_data.py --overwrite && python code/create_prerendered_figures.py
+    python code/check_payload_sizes.py --write-budget code/payload_budget.json --headroom 0.1
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+from benchmark_callbacks import (
+    LAYOUT_REQUEST_NAME,
+    CallbackClient,
+    FlaskTransport,
+    Session,
+    get_callback_names,
+)
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from climate_emotions_map.payload_sizes import (  # noqa
+    get_layout_sizes,
+    get_output_sizes,
+    get_trace_sizes,
+    is_figure,
+)
+
+RESPONSE_KEY = "response"
+# Smaller responses and outputs are left out of the budgets written with --write-budget,
+# since a few more bytes (e.g., a longer state name) would exceed their budget
+MIN_BUDGETED_BYTES = 1000
+
+
+class RecordingTransport:
+    """Keep the body of every response sent through another transport."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.responses = []
+
+    def send(
+        self, method: str, path: str, body: dict | None = None
+    ) -> tuple[int, bytes, int, float]:
+        """Send a request through the wrapped transport and keep the response body."""
+        status, content, sent_bytes, latency_ms = self.transport.send(
+            method, path, body
+        )
+        if status == 200:
+            self.responses.append((path, body, content))
+        return status, content, sent_bytes, latency_ms
+
+
+def update_max(sizes: dict, key: str, size: int):
+    """Keep the largest size seen for a key."""
+    sizes[key] = max(sizes.get(key, 0), size)
+
+
+def get_empty_sizes() -> dict:
+    """Return the sizes recorded for a callback before any response."""
+    return {RESPONSE_KEY: 0, "outputs": {}, "parts": {}}
+
+
+def collect_payload_sizes(app, sessions: int, seed: int) -> dict:
+    """
+    Replay user sessions and return the largest size of the responses of each callback (and of the layout),
+    of their outputs and of the parts of the figures they contain (data, layout, each trace and layout property).
+    """
+    rng = random.Random(seed)
+    sizes = {}
+    for _ in range(sessions):
+        transport = RecordingTransport(
+            FlaskTransport(app.server, accept_gzip=False)
+        )
+        client = CallbackClient(transport)
+        # NOTE: The callbacks are only registered with the app once it has handled its first request
+        callback_names = get_callback_names(app)
+        Session(client, rng).run()
+
+        for path, body, content in transport.responses:
+            if path == f"/{LAYOUT_REQUEST_NAME}":
+                name = LAYOUT_REQUEST_NAME
+            elif body is not None:
+                name = callback_names.get(body["output"], body["output"])
+            else:
+                continue
+            callback_sizes = sizes.setdefault(name, get_empty_sizes())
+            update_max(callback_sizes, RESPONSE_KEY, len(content))
+            if name == LAYOUT_REQUEST_NAME:
+                continue
+
+            response = json.loads(content)
+            for output, output_sizes in get_output_sizes(response).items():
+                update_max(
+                    callback_sizes["outputs"], output, output_sizes["total"]
+                )
+                for part in ["data", "layout"]:
+                    if part in output_sizes:
+                        update_max(
+                            callback_sizes["parts"],
+                            f"{output} {part}",
+                            output_sizes[part],
+                        )
+
+            for component_id, props in response["response"].items():
+                for prop, value in props.items():
+                    if not is_figure(value):
+                        continue
+                    for part, size in {
+                        **get_trace_sizes(value),
+                        **get_layout_sizes(value),
+                    }.items():
+                        update_max(
+                            callback_sizes["parts"],
+                            f"{component_id}.{prop} {part}",
+                            size,
+                        )
+    return sizes
+
+
+def print_largest(sizes: dict[str, int], top: int):
+    """Print the largest sizes."""
+    for key, size in sorted(sizes.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {key[:100]:<100} {size / 1000:>10.1f} kB")
+
+
+def print_report(sizes: dict, top: int):
+    """Print the largest responses and outputs of each callback, with the largest parts of their figures."""
+    for name, callback_sizes in sorted(
+        sizes.items(), key=lambda item: -item[1][RESPONSE_KEY]
+    ):
+        print(
+            f"\n{name}: largest response {callback_sizes[RESPONSE_KEY] / 1000:.1f} kB"
+        )
+        if callback_sizes["outputs"]:
+            print("  outputs:")
+            print_largest(callback_sizes["outputs"], top)
+        if callback_sizes["parts"]:
+            print("  figure data, layout, traces and layout properties:")
+            print_largest(callback_sizes["parts"], top)
+
+
+def check_budget(sizes: dict, budget: dict) -> list[str]:
+    """Return a description of each size that exceeds its budget (keyed on "response", an output or a figure part)."""
+    violations = []
+    for name, callback_budget in budget.items():
+        callback_sizes = sizes.get(name, get_empty_sizes())
+        for key, max_bytes in callback_budget.items():
+            size = (
+                callback_sizes[RESPONSE_KEY]
+                if key == RESPONSE_KEY
+                else callback_sizes["outputs"].get(
+                    key, callback_sizes["parts"].get(key)
+                )
+            )
+            if not size:
+                violations.append(f"{name}: no {key!r} was recorded")
+            elif size > max_bytes:
+                violations.append(
+                    f"{name}: {key} is {size} bytes > {max_bytes} bytes ({size / max_bytes - 1:+.1%})"
+                )
+    return violations
+
+
+def make_budget(sizes: dict, headroom: float) -> dict:
+    """Return a budget allowing the current size of the (large enough) responses and outputs of each callback, plus some headroom."""
+    budget = {}
+    for name, callback_sizes in sizes.items():
+        callback_budget = {
+            key: int(size * (1 + headroom))
+            for key, size in {
+                RESPONSE_KEY: callback_sizes[RESPONSE_KEY],
+                **callback_sizes["outputs"],
+            }.items()
+            if size >= MIN_BUDGETED_BYTES
+        }
+        if callback_budget:
+            budget[name] = callback_budget
+    return budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=10,
+        help="Number of user sessions to replay (default: 10)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the random choices of the sessions (default: 0)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=15,
+        help="Number of outputs, traces and layout properties to report for each callback (default: 15)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=Path,
+        default=None,
+        help="JSON file with the byte budgets to check (see above)",
+    )
+    parser.add_argument(
+        "--write-budget",
+        type=Path,
+        default=None,
+        help="JSON file to write a budget with the current sizes to",
+    )
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=0.1,
+        help="Fraction added to the current sizes in the budget written with --write-budget (default: 0.1)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write all the recorded sizes to",
+    )
+    args = parser.parse_args()
+
+    from climate_emotions_map.app import app  # noqa
+
+    sizes = collect_payload_sizes(app, sessions=args.sessions, seed=args.seed)
+    print_report(sizes, top=args.top)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(sizes, indent=2))
+        print(f"\nWrote the sizes to {args.output}")
+    if args.write_budget is not None:
+        args.write_budget.write_text(
+            # Ends with a newline, since the budget is committed to the repository
+            json.dumps(make_budget(sizes, args.headroom), indent=2)
+            + "\n"
+        )
+        print(f"\nWrote the budget to {args.write_budget}")
+    if args.budget is not None:
+        violations = check_budget(sizes, json.loads(args.budget.read_text()))
+        if violations:
+            sys.exit(
+                "\nPayload budget exceeded:\n"
+                + "\n".join(f"  - {violation}" for violation in violations)
+            )
+        print("\nAll payloads are within budget")
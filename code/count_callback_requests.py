@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Count how many server round trips (and clientside callbacks) each user interaction triggers,
+based on the callback graph registered by the app.
+
+Callbacks are followed through chains (e.g., a map click updates the state dropdown, which triggers other callbacks).
+Since it is not known in advance which outputs a callback will leave as no_update, the counts are an upper bound
+(e.g., there is no server request for the figures when they are all memoized in the browser).
+Requests made by background callbacks or custom JavaScript (e.g., fetch calls) are not included.
+
+Example usage:
+    python code/count_callback_requests.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dash._callback import GLOBAL_CALLBACK_LIST  # noqa
+
+from climate_emotions_map.app import app  # noqa
+
+# Component properties changed directly by the user for each interaction
+INTERACTIONS = {
+    "select a state": ["state-select.value"],
+    "click a state on the map": ["us-map.clickData"],
+    "toggle party stratification": ["party-stratify-switch.checked"],
+    "toggle show all endorsement levels": [
+        "response-threshold-control.checked"
+    ],
+    "change question": ["question-select.value"],
+    "select a weather event": ["impact-select.value"],
+    "open/close the sample drawer": ["drawer-button.n_clicks"],
+    "switch domain tab": ["domain-tabs.value"],
+}
+
+
+def get_prop_id(dependency: dict) -> str:
+    """Return the prop ID of a callback input/output, e.g. "state-select.value"."""
+    component_id = dependency["id"]
+    # Pattern-matching IDs are serialized as JSON strings
+    if component_id.startswith("{"):
+        component_id = json.dumps(json.loads(component_id), sort_keys=True)
+    return f"{component_id}.{dependency['property']}"
+
+
+def get_output_prop_ids(output: str) -> list[str]:
+    """Split the output spec of a callback into its prop IDs (multi-output specs look like "..a.b...c.d..")."""
+    if output.startswith(".."):
+        outputs = output.strip(".").split("...")
+    else:
+        outputs = [output]
+    return [
+        get_prop_id(dict(zip(["id", "property"], out.rsplit(".", 1))))
+        for out in outputs
+    ]
+
+
+def get_callbacks() -> list[dict]:
+    """Return the inputs, outputs and type (server or clientside) of every registered callback."""
+    callbacks = []
+    for callback in GLOBAL_CALLBACK_LIST + app._callback_list:
+        callbacks.append(
+            {
+                "inputs": {get_prop_id(dep) for dep in callback["inputs"]},
+                "outputs": set(get_output_prop_ids(callback["output"])),
+                "clientside": bool(callback.get("clientside_function")),
+            }
+        )
+    return callbacks
+
+
+def count_triggered_callbacks(
+    changed_prop_ids: list[str], callbacks: list[dict]
+) -> dict:
+    """
+    Follow the callback chain from the changed props and count server requests and clientside callbacks.
+
+    NOTE: The Dash renderer waits for upstream callbacks in a chain to finish before firing the downstream ones,
+    so each callback is counted (at most) once per interaction.
+    """
+    # Maps each changed prop ID to the callbacks that changed it (None for the user)
+    changed = {prop_id: {None} for prop_id in changed_prop_ids}
+    fired = set()
+    while changed:
+        next_changed = {}
+        for idx, callback in enumerate(callbacks):
+            # Callbacks are not re-triggered by their own outputs
+            if idx in fired or not any(
+                changed[prop_id] - {idx}
+                for prop_id in callback["inputs"] & changed.keys()
+            ):
+                continue
+            fired.add(idx)
+            for prop_id in callback["outputs"]:
+                next_changed.setdefault(prop_id, set()).add(idx)
+        changed = next_changed
+
+    n_clientside = sum(callbacks[idx]["clientside"] for idx in fired)
+    return {
+        "server_requests": len(fired) - n_clientside,
+        "clientside_callbacks": n_clientside,
+    }
+
+
+if __name__ == "__main__":
+    callbacks = get_callbacks()
+    print(f"{'interaction':<40} {'server requests':>16} {'clientside':>11}")
+    for interaction, changed_prop_ids in INTERACTIONS.items():
+        counts = count_triggered_callbacks(changed_prop_ids, callbacks)
+        print(
+            f"{interaction:<40} {counts['server_requests']:>16} {counts['clientside_callbacks']:>11}"
+        )
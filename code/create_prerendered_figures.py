@@ -1,4 +1,10 @@
 #!/usr/bin/env python
+"""
+Prerender the stacked bar plots and sample descriptive plots for every combination of inputs that can be selected in the app.
+
+The figures are stored serialized to JSON (rather than as plotly figure objects), in pickled dictionaries keyed
+on their inputs, so that the app loads them quickly and keeps them compact in memory.
+"""
 
 import pickle as pkl
 import sys
@@ -7,6 +13,10 @@ from pathlib import Path
 # Hacky hacky gets the job done for the next import
 sys.path.append(str(Path(__file__).parent.parent))
 
+from climate_emotions_map.layout import SINGLE_SUBQUESTION_FIG_KW  # noqa
+from climate_emotions_map.make_descriptive_plots import (  # noqa
+    make_descriptive_plots,
+)
 from climate_emotions_map.make_stacked_bar_plots import (  # noqa
     DATA_DICTIONARIES,
     make_stacked_bar,
@@ -16,10 +26,21 @@ from climate_emotions_map.utility import DEFAULT_QUESTION, NUM_DECIMALS  # noqa
 UNIQUE_QUESTIONS = (
     DATA_DICTIONARIES["question_dictionary.tsv"]["question"].unique().tolist()
 )
+QUESTION_SUBQUESTION_PAIRS = list(
+    DATA_DICTIONARIES["subquestion_dictionary.tsv"][
+        ["question", "sub_question"]
+    ].itertuples(index=False, name=None)
+)
 UNIQUE_STATES = (
     DATA_DICTIONARIES["state_abbreviations.tsv"]["state"].unique().tolist()
 )
 OUTPUT_FILE = Path(__file__).parents[0] / "assets/prerendered_figures.pkl"
+SINGLE_SUBQUESTION_OUTPUT_FILE = (
+    Path(__file__).parents[0] / "assets/prerendered_single_figures.pkl"
+)
+DESCRIPTIVE_OUTPUT_FILE = (
+    Path(__file__).parents[0] / "assets/prerendered_descriptive_figures.pkl"
+)
 
 
 def make_full_set_of_barplots(
@@ -27,16 +48,30 @@ def make_full_set_of_barplots(
 ):
     """
     This returns a dictionary for all questions where keys are question IDs
-    and values are the plotly graph object figure for each question.
+    and values are the plotly figure for each question serialized to JSON.
     """
     return {
         question: make_stacked_bar(
             question, "all", state, stratify, threshold, decimals
-        )
+        ).to_json()
         for question in UNIQUE_QUESTIONS
     }
 
 
+def get_state_stratify_threshold_combinations():
+    """Return all valid combinations of (state, stratified, threshold) that can be selected in the app."""
+    combinations = []
+    # A state of None means we are looking at national level questions
+    for state in UNIQUE_STATES + [None]:
+        for stratify in [False, True]:
+            # For state level figures, we don't stratify by party
+            if state is not None and stratify:
+                continue
+            for threshold in [None, DEFAULT_QUESTION["outcome"]]:
+                combinations.append((state, stratify, threshold))
+    return combinations
+
+
 def make_all_figures():
     """
     Iterate through all combinations of questions and states
@@ -45,21 +80,74 @@ def make_all_figures():
     Returns a dictionary keyed on the tuple of (state, stratified, threshold) in that order
     """
     figures = {}
-    # A state of None means we are looking at national level questions
+    for (
+        state,
+        stratify,
+        threshold,
+    ) in get_state_stratify_threshold_combinations():
+        key = (state, stratify, threshold, NUM_DECIMALS)
+        figures[key] = make_full_set_of_barplots(*key)
+    return figures
+
+
+def make_all_single_subquestion_figures():
+    """
+    Iterate through all combinations of subquestions and states
+    to create the complete set of figures for the selected question bar plot.
+
+    Returns a dictionary keyed on the tuple of (question, subquestion, state, stratified, threshold) in that order
+    """
+    figures = {}
+    for question, subquestion in QUESTION_SUBQUESTION_PAIRS:
+        for (
+            state,
+            stratify,
+            threshold,
+        ) in get_state_stratify_threshold_combinations():
+            key = (
+                question,
+                subquestion,
+                state,
+                stratify,
+                threshold,
+                NUM_DECIMALS,
+            )
+            figures[key] = make_stacked_bar(
+                question=question,
+                subquestion=subquestion,
+                state=state,
+                stratify=stratify,
+                threshold=threshold,
+                decimals=NUM_DECIMALS,
+                fig_kw=SINGLE_SUBQUESTION_FIG_KW,
+            ).to_json()
+    return figures
+
+
+def make_all_descriptive_figures():
+    """
+    Create the sample descriptive plots for the whole sample and for each state.
+
+    Returns a dictionary keyed on the tuple of (state, decimals) in that order
+    """
+    figures = {}
+    # A state of None means we are looking at the whole sample
     for state in UNIQUE_STATES + [None]:
-        for stratify in [False, True]:
-            # For state level figures, we don't stratify by party
-            if state is not None and stratify:
-                continue
-            for threshold in [None, DEFAULT_QUESTION["outcome"]]:
-                key = (state, stratify, threshold, NUM_DECIMALS)
-                figures[key] = make_full_set_of_barplots(*key)
+        key = (state, NUM_DECIMALS)
+        figures[key] = make_descriptive_plots(
+            state=state, decimals=NUM_DECIMALS
+        ).to_json()
     return figures
 
 
 if __name__ == "__main__":
-    figures = make_all_figures()
-    with OUTPUT_FILE.open("wb") as f:
-        pkl.dump(figures, f)
+    for output_file, make_figures in [
+        (OUTPUT_FILE, make_all_figures),
+        (SINGLE_SUBQUESTION_OUTPUT_FILE, make_all_single_subquestion_figures),
+        (DESCRIPTIVE_OUTPUT_FILE, make_all_descriptive_figures),
+    ]:
+        figures = make_figures()
+        with output_file.open("wb") as f:
+            pkl.dump(figures, f)
 
-    print(f"Done prerendering figures to {OUTPUT_FILE}!")
+        print(f"Done prerendering figures to {output_file}!")
@@ -0,0 +1,490 @@
+#!/usr/bin/env python
+"""
+Generate a synthetic survey dataset with the same schema as the data submodule, at a configurable scale.
+
+The survey results (data/survey_results/*.tsv), data dictionaries (data/data_dictionaries/*.tsv)
+and the GeoJSON of the survey states and clusters (code/assets/survey_states.json) are written,
+so the app, the prerendering script and the benchmarks can run without access to the (private) data submodule,
+and with many more questions, subquestions, states/clusters, parties or outcomes than the real data.
+
+NOTE: The app always reads the data from the repository, so by default this writes into the repository.
+Since code/assets/survey_states.json is tracked (and the data directory may hold the real data),
+the script refuses to replace either of them unless --overwrite is given
+(restore the GeoJSON with `git checkout code/assets/survey_states.json`).
+
+Example usage:
+    python code/create_synthetic_data.py
+    python code/create_synthetic_data.py --questions 60 --max-subquestions 12 --parties 6 --overwrite
+"""
+
+import argparse
+import string
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from create_survey_geojson import (
+    CUSTOM_STATE_NAME_MAP_DEFAULT,
+    FPATH_STATES_JSON_DEFAULT,
+    create_survey_geojson,
+)
+
+REPO_DIR = Path(__file__).parents[1]
+
+# Mirrors DEFAULT_QUESTION in utility.py, which has to exist in the data
+DEFAULT_QUESTION = "q4"
+DEFAULT_DOMAIN = "Climate emotions & beliefs"
+
+# Mirrors PARTY_ORDER in make_stacked_bar_plots.py, extra parties are added after these
+PARTIES = ["Democrat", "Independent/Other", "Republican"]
+
+# The thresholds of the Likert outcomes (see AVAILABLE_THRESHOLDS in make_stacked_bar_plots.py)
+THRESHOLDS = {"3+": 3, "4+": 4}
+NA_OUTCOME_LABEL = "not3+"
+
+# Mirrors IMPACT_VARIABLES and CATEGORY_ORDERS in make_descriptive_plots.py,
+# since the descriptive plots have a fixed set of demographic variables
+IMPACTS = [
+    "drought",
+    "flood",
+    "heat",
+    "hurricane",
+    "smoke",
+    "tornado",
+    "wildfire",
+]
+DEMOGRAPHIC_CATEGORIES = {
+    "age": ["16-17", "18-25"],
+    "sex": ["Female", "Male"],
+    "party": PARTIES,
+    "race": ["Black", "White", "Other"],
+    "ethnicity": ["Not Hispanic", "Hispanic"],
+    "student": ["No", "Yes"],
+    "employed": [
+        "Not employed",
+        "Employed - part time",
+        "Employed - full time",
+    ],
+    "location": ["Rural", "Suburban", "Urban"],
+    "hh_origin": [
+        "Working class",
+        "Lower class",
+        "Middle class",
+        "Upper middle class",
+        "Upper class",
+    ],
+    **{impact: ["No", "Yes"] for impact in IMPACTS},
+    "q2": [
+        "Very sure it is happening",
+        "Moderately sure it is happening",
+        "Slightly sure it is happening",
+        "Don't know",
+        "Slightly sure it is not happening",
+        "Moderately sure it is not happening",
+        "Very sure it is not happening",
+    ],
+}
+
+# The states that can be shown on the map (with locationmode="USA-states")
+STATE_ABBREVIATIONS = {
+    "Alabama": "AL",
+    "Alaska": "AK",
+    "Arizona": "AZ",
+    "Arkansas": "AR",
+    "California": "CA",
+    "Colorado": "CO",
+    "Connecticut": "CT",
+    "Delaware": "DE",
+    "Washington DC": "DC",
+    "Florida": "FL",
+    "Georgia": "GA",
+    "Hawaii": "HI",
+    "Idaho": "ID",
+    "Illinois": "IL",
+    "Indiana": "IN",
+    "Iowa": "IA",
+    "Kansas": "KS",
+    "Kentucky": "KY",
+    "Louisiana": "LA",
+    "Maine": "ME",
+    "Maryland": "MD",
+    "Massachusetts": "MA",
+    "Michigan": "MI",
+    "Minnesota": "MN",
+    "Mississippi": "MS",
+    "Missouri": "MO",
+    "Montana": "MT",
+    "Nebraska": "NE",
+    "Nevada": "NV",
+    "New Hampshire": "NH",
+    "New Jersey": "NJ",
+    "New Mexico": "NM",
+    "New York": "NY",
+    "North Carolina": "NC",
+    "North Dakota": "ND",
+    "Ohio": "OH",
+    "Oklahoma": "OK",
+    "Oregon": "OR",
+    "Pennsylvania": "PA",
+    "Rhode Island": "RI",
+    "South Carolina": "SC",
+    "South Dakota": "SD",
+    "Tennessee": "TN",
+    "Texas": "TX",
+    "Utah": "UT",
+    "Vermont": "VT",
+    "Virginia": "VA",
+    "Washington": "WA",
+    "West Virginia": "WV",
+    "Wisconsin": "WI",
+    "Wyoming": "WY",
+}
+
+
+def get_cluster_name(states: list[str], index: int) -> str:
+    """Return the name of a cluster of states, in the same format as in the survey data."""
+    if index < len(string.ascii_uppercase):
+        label = string.ascii_uppercase[index]
+    else:
+        label = str(index + 1)
+    return f"{', '.join(states)} (Cluster {label})"
+
+
+def make_regions(n_regions: int, rng: np.random.Generator) -> dict[str, list]:
+    """Randomly group the states into regions (single states or clusters), returning the states in each region."""
+    states = sorted(STATE_ABBREVIATIONS)
+    if not 1 <= n_regions <= len(states):
+        raise ValueError(
+            f"The number of regions must be between 1 and {len(states)}, got {n_regions}"
+        )
+    groups = np.array_split(rng.permutation(states), n_regions)
+
+    regions = {}
+    for group in groups:
+        group = sorted(group.tolist())
+        if len(group) == 1:
+            regions[group[0]] = group
+        else:
+            regions[get_cluster_name(group, len(regions))] = group
+    return regions
+
+
+def make_questions(
+    n_questions: int,
+    max_subquestions: int,
+    n_domains: int,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    """Return the questions (with their domain and number of subquestions)."""
+    if n_questions < int(DEFAULT_QUESTION[1:]):
+        raise ValueError(
+            f"There must be at least {DEFAULT_QUESTION[1:]} questions, for the default question {DEFAULT_QUESTION}"
+        )
+    domains = [DEFAULT_DOMAIN] + [
+        f"Domain {i + 1}" for i in range(1, n_domains)
+    ]
+    questions = []
+    for i in range(n_questions):
+        question = f"q{i + 1}"
+        domain = (
+            DEFAULT_DOMAIN
+            if question == DEFAULT_QUESTION
+            else domains[i % n_domains]
+        )
+        questions.append(
+            {
+                "question": question,
+                "domain": domain,
+                "n_subquestions": int(rng.integers(1, max_subquestions + 1)),
+            }
+        )
+    return pd.DataFrame(questions)
+
+
+def make_opinions(
+    questions: pd.DataFrame,
+    n_outcomes: int,
+    rng: np.random.Generator,
+    **strata,
+) -> list[dict]:
+    """Return random opinion percentages (for each outcome and threshold) of all subquestions, for one stratum."""
+    outcomes = [str(outcome) for outcome in range(1, n_outcomes + 1)]
+    rows = []
+    for row in questions.itertuples():
+        for subquestion in range(1, row.n_subquestions + 1):
+            percentages = rng.dirichlet(np.ones(n_outcomes))
+            keys = {
+                **strata,
+                "question": row.question,
+                "sub_question": str(subquestion),
+            }
+            for outcome, percentage in zip(outcomes, percentages):
+                rows.append(
+                    {
+                        **keys,
+                        "outcome": outcome,
+                        "percentage": round(percentage, 4),
+                    }
+                )
+            for threshold, lowest_outcome in THRESHOLDS.items():
+                rows.append(
+                    {
+                        **keys,
+                        "outcome": threshold,
+                        "percentage": round(
+                            percentages[lowest_outcome - 1 :].sum(), 4
+                        ),
+                    }
+                )
+    return rows
+
+
+def make_sample_description(rng: np.random.Generator, **strata) -> list[dict]:
+    """Return random sample sizes and percentages for each demographic category, for one stratum."""
+    rows = []
+    for demographic_variable, categories in DEMOGRAPHIC_CATEGORIES.items():
+        percentages = rng.dirichlet(np.ones(len(categories)))
+        for category, percentage in zip(categories, percentages):
+            rows.append(
+                {
+                    **strata,
+                    "demographic_variable": demographic_variable,
+                    "category": category,
+                    "n": int(rng.integers(5, 400)),
+                    "percentage": round(percentage, 4),
+                }
+            )
+    return rows
+
+
+def make_survey_results(
+    questions: pd.DataFrame,
+    regions: dict[str, list],
+    parties: list[str],
+    n_outcomes: int,
+    rng: np.random.Generator,
+) -> dict[str, pd.DataFrame]:
+    """Return the survey result tables, keyed on their file name."""
+    return {
+        "opinions_wholesample.tsv": make_opinions(questions, n_outcomes, rng),
+        "opinions_state.tsv": [
+            row
+            for region in regions
+            for row in make_opinions(questions, n_outcomes, rng, state=region)
+        ],
+        "opinions_party.tsv": [
+            row
+            for party in parties
+            for row in make_opinions(questions, n_outcomes, rng, party=party)
+        ],
+        "sampledesc_wholesample.tsv": make_sample_description(rng),
+        "sampledesc_state.tsv": [
+            row
+            for region in regions
+            for row in make_sample_description(rng, state=region)
+        ],
+        "samplesizes_state.tsv": [
+            {"state": region, "n": int(rng.integers(50, 500))}
+            for region in regions
+        ],
+        "samplesizes_party.tsv": [
+            {"party": party, "n": int(rng.integers(500, 2000))}
+            for party in parties
+        ],
+    }
+
+
+def make_data_dictionaries(
+    questions: pd.DataFrame, regions: dict[str, list], n_outcomes: int
+) -> dict[str, list[dict]]:
+    """Return the data dictionary tables, keyed on their file name."""
+    outcomes = [str(outcome) for outcome in range(1, n_outcomes + 1)]
+    domain_texts = {
+        domain: f"{domain} (synthetic)"
+        for domain in questions["domain"].unique()
+    }
+    return {
+        "question_dictionary.tsv": [
+            {
+                "question": row.question,
+                "domain_short": row.domain,
+                "domain_text": domain_texts[row.domain],
+                "full_text": f"Synthetic question {row.question}",
+                "dropdown_text": f"Question {row.question}",
+            }
+            for row in questions.itertuples()
+        ],
+        "subquestion_dictionary.tsv": [
+            {
+                "question": row.question,
+                "sub_question": str(subquestion),
+                "full_text": f"Synthetic subquestion {subquestion} of {row.question}",
+                "dropdown_text": f"Subquestion {row.question}.{subquestion}",
+                "ignore": False,
+            }
+            for row in questions.itertuples()
+            for subquestion in range(1, row.n_subquestions + 1)
+        ],
+        "outcome_dictionary.tsv": [
+            {
+                "question": row.question,
+                "outcome": outcome,
+                "full_text": f"Outcome {outcome}",
+            }
+            for row in questions.itertuples()
+            for outcome in outcomes + list(THRESHOLDS) + [NA_OUTCOME_LABEL]
+        ],
+        "threshold_dictionary.tsv": [
+            {"threshold": threshold, "full_text": threshold}
+            for threshold in THRESHOLDS
+        ],
+        "impacts_list.tsv": [{"impact": impact} for impact in IMPACTS],
+        "demographics_dictionary.tsv": [
+            {
+                "demographic_variable": demographic_variable,
+                "full_text": demographic_variable.capitalize(),
+            }
+            for demographic_variable in list(DEMOGRAPHIC_CATEGORIES)
+            + ["impact"]
+        ],
+        "state_abbreviations.tsv": [
+            {
+                "state": region,
+                "state_abbreviated": ", ".join(
+                    STATE_ABBREVIATIONS[state] for state in states
+                ),
+            }
+            for region, states in regions.items()
+        ],
+    }
+
+
+def create_synthetic_data(
+    output_dir: Path,
+    n_questions: int,
+    max_subquestions: int,
+    n_domains: int,
+    n_regions: int,
+    n_parties: int,
+    n_outcomes: int,
+    seed: int,
+):
+    """Write a synthetic dataset (survey results, data dictionaries and GeoJSON) to a directory."""
+    rng = np.random.default_rng(seed)
+    questions = make_questions(n_questions, max_subquestions, n_domains, rng)
+    regions = make_regions(n_regions, rng)
+    parties = PARTIES[:n_parties] + [
+        f"Other party {i + 1}" for i in range(n_parties - len(PARTIES))
+    ]
+
+    tables = {
+        "survey_results": make_survey_results(
+            questions, regions, parties, n_outcomes, rng
+        ),
+        "data_dictionaries": make_data_dictionaries(
+            questions, regions, n_outcomes
+        ),
+    }
+    for subdirectory, subdirectory_tables in tables.items():
+        target_dir = output_dir / "data" / subdirectory
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for file, rows in subdirectory_tables.items():
+            pd.DataFrame(rows).to_csv(target_dir / file, sep="\t", index=False)
+            print(f"Wrote {len(rows)} rows to {target_dir / file}")
+
+    fpath_geojson = output_dir / "code" / "assets" / "survey_states.json"
+    fpath_geojson.parent.mkdir(parents=True, exist_ok=True)
+    create_survey_geojson(
+        regions,
+        fpath_states_json=FPATH_STATES_JSON_DEFAULT,
+        custom_state_name_map=CUSTOM_STATE_NAME_MAP_DEFAULT,
+        fpath_out=fpath_geojson,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=REPO_DIR,
+        help=f"Directory to write data/ and code/assets/survey_states.json to (default: {REPO_DIR})",
+    )
+    parser.add_argument(
+        "--questions",
+        type=int,
+        default=10,
+        help="Number of questions (default: 10)",
+    )
+    parser.add_argument(
+        "--max-subquestions",
+        type=int,
+        default=6,
+        help="Maximum number of subquestions per question (default: 6)",
+    )
+    parser.add_argument(
+        "--domains",
+        type=int,
+        default=3,
+        help="Number of question domains (default: 3)",
+    )
+    parser.add_argument(
+        "--regions",
+        type=int,
+        default=40,
+        help=f"Number of states and clusters of states, at most {len(STATE_ABBREVIATIONS)} (default: 40)",
+    )
+    parser.add_argument(
+        "--parties",
+        type=int,
+        default=len(PARTIES),
+        help=f"Number of parties (default: {len(PARTIES)})",
+    )
+    parser.add_argument(
+        "--outcomes",
+        type=int,
+        # Number of Likert outcomes with a color palette (see PALETTES_BY_LENGTH in make_stacked_bar_plots.py)
+        choices=[5, 7],
+        default=5,
+        help="Number of Likert outcomes of each question (default: 5)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the random data (default: 0)",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Overwrite the survey results and the GeoJSON of the survey states if they already exist",
+    )
+    args = parser.parse_args()
+
+    existing = [
+        path
+        for path in [
+            args.output_dir / "data" / "survey_results",
+            args.output_dir / "code" / "assets" / "survey_states.json",
+        ]
+        if path.exists()
+    ]
+    if existing and not args.overwrite:
+        sys.exit(
+            f"Not replacing {' and '.join(map(str, existing))}, use --overwrite to replace them"
+        )
+
+    create_synthetic_data(
+        args.output_dir,
+        n_questions=args.questions,
+        max_subquestions=args.max_subquestions,
+        n_domains=args.domains,
+        n_regions=args.regions,
+        n_parties=args.parties,
+        n_outcomes=args.outcomes,
+        seed=args.seed,
+    )
+    print(
+        "Done! Run create_prerendered_figures.py to prerender the figures for this data."
+    )
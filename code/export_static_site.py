@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+Export the dashboard as a static site that can be served from any static file server (or CDN), without Python.
+
+Every output of the server callbacks is a function of the selected state, question, weather event (impact),
+party stratification and endorsement threshold, so the figures for all possible selections are exported to JSON files.
+The server callbacks are replaced by clientside callbacks that look up these files (see assets/static_export.js).
+
+The exported site contains:
+- index.html, the Dash renderer and component bundles, and the app assets
+- _dash-layout.json and _dash-dependencies.json, which the Dash renderer otherwise requests from the server
+- figures/, with one file per distinct figure (named by content hash) and an index per kind of figure
+  mapping the memo keys used by the browser (see getFigureMemoKeys in assets/clientside.js) to these files
+
+Example usage:
+    python code/export_static_site.py --output-dir static_site
+    python -m http.server --directory static_site
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from plotly.utils import PlotlyJSONEncoder
+
+# The static site can only use what is in the exported files
+os.environ["COMPRESS_RESPONSES"] = "false"
+os.environ["PREFETCH_ON_HOVER"] = "false"
+
+# Hacky hacky gets the job done for the next import
+sys.path.append(str(Path(__file__).parent.parent))
+
+from climate_emotions_map import app as app_module, utility as utils  # noqa
+from climate_emotions_map.data_loader import DOMAIN_TEXT  # noqa
+
+ASSETS_DIR = Path(app_module.__file__).parent / "assets"
+DEFAULT_OUTPUT_DIR = Path(__file__).parents[1] / "static_site"
+
+# Clientside replacements (in assets/static_export.js) for the server callbacks, keyed on their first input
+STATIC_CALLBACKS = {
+    "selection-request": "updateSelectionDependentOutputs",
+    "deferred-selection-request": "updateDeferredSelectionDependentOutputs",
+}
+STACKED_BAR_PLOT_IDS = {
+    "id": '{"domain":["ALL"],"question":["ALL"],"type":"stacked-bar-plot"}',
+    "property": "id",
+}
+
+
+def get_memo_key(*parts) -> str:
+    """Return the memo key for a figure, serialized the same way as by JSON.stringify in the browser."""
+    return json.dumps(parts, separators=(",", ":"), ensure_ascii=False)
+
+
+def get_question_values() -> list[str]:
+    """Return the values of all options in the question dropdown."""
+    return [
+        item["value"]
+        for group in utils.get_question_options()
+        for item in group["items"]
+    ]
+
+
+def get_selectable_states() -> list[str | None]:
+    """Return all states that can be selected (None being the whole sample)."""
+    return [None] + [option["value"] for option in utils.get_state_options()]
+
+
+def get_stratify_show_all_combinations() -> list[tuple]:
+    """Return all valid combinations of (state, stratify, show all responses) that can be selected in the app."""
+    combinations = []
+    for state in get_selectable_states():
+        for stratify in [False, True]:
+            # Party stratification is only available for the whole sample
+            if state is not None and stratify:
+                continue
+            for show_all in [False, True]:
+                combinations.append((state, stratify, show_all))
+    return combinations
+
+
+def iter_figures():
+    """Yield the (kind, memo key, render function) of every figure the server callbacks can send."""
+    question_values = get_question_values()
+    impacts = [None] + [
+        option["value"] for option in utils.get_impact_options()
+    ]
+    combinations = get_stratify_show_all_combinations()
+
+    for state in get_selectable_states():
+        yield (
+            "descriptive",
+            get_memo_key("descriptive", state),
+            partial(app_module.get_sample_descriptive_plot, state=state),
+        )
+
+    for question_value in question_values:
+        question, subquestion = utils.extract_question_subquestion(
+            question_value
+        )
+        for state in get_selectable_states():
+            for impact in impacts:
+                yield (
+                    "map",
+                    get_memo_key("map", question_value, state, impact),
+                    partial(
+                        app_module.get_map,
+                        question,
+                        subquestion,
+                        state,
+                        impact,
+                    ),
+                )
+        for state, stratify, show_all in combinations:
+            threshold = utils.get_threshold(show_all)
+            yield (
+                "selected",
+                get_memo_key(
+                    "selected", question_value, state, stratify, threshold
+                ),
+                partial(
+                    app_module.get_selected_question_bar_plot,
+                    question=question,
+                    subquestion=subquestion,
+                    state=state,
+                    stratify=stratify,
+                    threshold=threshold,
+                ),
+            )
+
+    for domain in DOMAIN_TEXT.values():
+        for state, stratify, show_all in combinations:
+            threshold = utils.get_threshold(show_all)
+            yield (
+                "stacked",
+                get_memo_key("stacked", domain, state, stratify, threshold),
+                partial(
+                    app_module.get_domain_stacked_bar_plots,
+                    state=state,
+                    stratify=stratify,
+                    threshold=threshold,
+                    domain=domain,
+                ),
+            )
+
+
+def write_content_addressed_json(obj, directory: Path) -> str:
+    """Write an object to a JSON file named by the hash of its content (if not already written) and return the name."""
+    content = json.dumps(obj, cls=PlotlyJSONEncoder, separators=(",", ":"))
+    name = hashlib.sha256(content.encode("utf-8")).hexdigest()[:20]
+    target_file = directory / f"{name}.json"
+    if not target_file.exists():
+        target_file.write_text(content)
+    return name
+
+
+def externalize_geojson(obj, figures_dir: Path):
+    """
+    Replace the GeoJSON of the choropleth traces in an object by the URL of a file holding it,
+    so that it is only downloaded once rather than with every map figure.
+    """
+    if isinstance(obj, list):
+        return [externalize_geojson(item, figures_dir) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    obj = {
+        key: externalize_geojson(value, figures_dir)
+        for key, value in obj.items()
+    }
+    if obj.get("type") == "choropleth" and isinstance(
+        obj.get("geojson"), dict
+    ):
+        name = write_content_addressed_json(obj["geojson"], figures_dir)
+        # Plotly accepts the URL of a GeoJSON file in place of the GeoJSON itself
+        obj["geojson"] = f"figures/{name}.json"
+    return obj
+
+
+def render_figure(figure_spec: tuple) -> tuple[str, str, dict]:
+    """Render a figure from iter_figures, returning its kind, memo key and JSON-serializable dict."""
+    kind, memo_key, render = figure_spec
+    return (
+        kind,
+        memo_key,
+        json.loads(json.dumps(render(), cls=PlotlyJSONEncoder)),
+    )
+
+
+def export_figures(figures_dir: Path, jobs: int) -> dict[str, int]:
+    """Export every figure the server callbacks can send and the index of each kind of figure."""
+    indexes = {}
+    # Most of the time is spent rendering the maps, which is done in parallel
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for kind, memo_key, figure in executor.map(
+            render_figure, iter_figures(), chunksize=16
+        ):
+            figure = externalize_geojson(figure, figures_dir)
+            indexes.setdefault(kind, {})[memo_key] = (
+                write_content_addressed_json(figure, figures_dir)
+            )
+
+    for kind, index in indexes.items():
+        (figures_dir / f"index-{kind}.json").write_text(
+            json.dumps(index, ensure_ascii=False)
+        )
+    return {kind: len(index) for kind, index in indexes.items()}
+
+
+def make_static_dependencies(dependencies: list[dict]) -> list[dict]:
+    """Replace the server callbacks by their clientside counterparts in assets/static_export.js."""
+    for dependency in dependencies:
+        if dependency.get("clientside_function"):
+            continue
+        first_input = dependency["inputs"][0]["id"]
+        if first_input not in STATIC_CALLBACKS:
+            raise RuntimeError(
+                f"No static replacement for the server callback with output {dependency['output']}. "
+                "Add one to assets/static_export.js and STATIC_CALLBACKS."
+            )
+        dependency["clientside_function"] = {
+            "namespace": "static_export",
+            "function_name": STATIC_CALLBACKS[first_input],
+        }
+        # The pattern-matching outputs are not available to clientside callbacks, so pass their IDs instead
+        if first_input == "deferred-selection-request":
+            dependency["state"] = dependency["state"] + [STACKED_BAR_PLOT_IDS]
+    return dependencies
+
+
+def make_static_index(index_html: str) -> str:
+    """Make the URLs in the index page relative (so the site can be served from any path) and load static_export.js."""
+    index_html = re.sub(r'(src|href)="/(?!/)', r'\1="./', index_html)
+
+    # The Dash renderer requests the layout, dependencies and async component bundles relative to this prefix
+    def make_relative_config(match: re.Match) -> str:
+        config = json.loads(match.group(2))
+        config["requests_pathname_prefix"] = "./"
+        # Dash escapes slashes in the config so that it cannot close the script tag early
+        config_json = json.dumps(config, separators=(",", ":")).replace(
+            "/", "\\u002f"
+        )
+        return f"{match.group(1)}{config_json}{match.group(3)}"
+
+    index_html, n_configs = re.subn(
+        r'(<script id="_dash-config" type="application/json">)(.*?)(</script>)',
+        make_relative_config,
+        index_html,
+        flags=re.DOTALL,
+    )
+    if n_configs != 1:
+        raise RuntimeError("Could not find the Dash config in the index page")
+    return index_html.replace(
+        '<script id="_dash-renderer"',
+        '<script src="./assets/static_export.js"></script>\n'
+        '            <script id="_dash-renderer"',
+    )
+
+
+def export_static_site(output_dir: Path, jobs: int) -> dict[str, int]:
+    """Export the dashboard as a static site, returning the number of figures exported of each kind."""
+    client = app_module.server.test_client()
+    figures_dir = output_dir / "figures"
+    figures_dir.mkdir(parents=True, exist_ok=True)
+
+    index_html = client.get("/").get_data(as_text=True)
+    (output_dir / "index.html").write_text(make_static_index(index_html))
+
+    # Scripts and stylesheets referenced by the index page, followed by all component bundles
+    # (including those loaded asynchronously, e.g. for dcc.Graph)
+    urls = re.findall(r'(?:src|href)="(/[^/"][^"]*)"', index_html)
+    for package, paths in app_module.app.registered_paths.items():
+        urls += [
+            f"{app_module.app.config.requests_pathname_prefix}_dash-component-suites/{package}/{path}"
+            for path in paths
+            if not path.endswith(".map")
+        ]
+    for url in urls:
+        target_file = output_dir / url.split("?")[0].lstrip("/")
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        target_file.write_bytes(client.get(url).get_data())
+    shutil.copy(ASSETS_DIR / "static_export.js", output_dir / "assets")
+
+    layout = externalize_geojson(client.get("/_dash-layout").json, figures_dir)
+    (output_dir / "_dash-layout.json").write_text(
+        json.dumps(layout, separators=(",", ":"))
+    )
+    dependencies = make_static_dependencies(
+        client.get("/_dash-dependencies").json
+    )
+    (output_dir / "_dash-dependencies.json").write_text(
+        json.dumps(dependencies)
+    )
+
+    return export_figures(figures_dir, jobs=jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"Directory to export the site to (default: {DEFAULT_OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes used to render the figures (default: number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    n_figures = export_static_site(args.output_dir, jobs=args.jobs)
+    for kind, n in n_figures.items():
+        print(f"Exported {n} {kind} figures")
+    print(f"Done exporting the static site to {args.output_dir}!")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+"""
+Load test the app under gunicorn, with concurrent simulated users replaying the user sessions
+of benchmark_callbacks.py, to find how many concurrent sessions a worker configuration sustains.
+
+The app is started locally with the given number of gunicorn workers and threads (or an already running
+server is targeted with --url), and each simulated user repeatedly loads the page and goes through a session
+until the end of the test. The throughput, latency percentiles and error rates are reported overall
+and for each callback.
+
+Example usage:
+    python code/load_test.py --workers 2 --threads 4 --users 8 --duration 60
+    python code/load_test.py --url http://127.0.0.1:8050 --users 16
+"""
+
+import argparse
+import gzip
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmark_callbacks import (
+    CallbackClient,
+    Session,
+    get_percentile,
+    print_summary,
+    summarize_records,
+)
+
+REPO_DIR = Path(__file__).parents[1]
+
+
+class HTTPTransport:
+    """Send requests to a running server over HTTP."""
+
+    def __init__(self, url: str, accept_gzip: bool, timeout: float):
+        self.url = url.rstrip("/")
+        self.accept_gzip = accept_gzip
+        self.timeout = timeout
+
+    def send(
+        self, method: str, path: str, body: dict | None = None
+    ) -> tuple[int, bytes, int, float]:
+        """Send a request and return the status, (decompressed) response body, bytes sent over the wire and latency in ms."""
+        headers = {"Accept-Encoding": "gzip"} if self.accept_gzip else {}
+        data = None
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}{path}", data=data, headers=headers, method=method
+        )
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(
+                request, timeout=self.timeout
+            ) as response:
+                status, content = response.status, response.read()
+                content_encoding = response.headers.get("Content-Encoding")
+        except urllib.error.HTTPError as error:
+            status, content = error.code, error.read()
+            content_encoding = error.headers.get("Content-Encoding")
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        sent_bytes = len(content)
+        if content_encoding == "gzip":
+            content = gzip.decompress(content)
+        return status, content, sent_bytes, latency_ms
+
+
+def get_free_port() -> int:
+    """Return a free local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(
+    port: int,
+    workers: int,
+    threads: int,
+    preload: bool,
+    startup_timeout: float,
+    timeout: float,
+) -> subprocess.Popen:
+    """Start the app under gunicorn and wait until it responds (polling it with the request timeout)."""
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+        "--threads",
+        str(threads),
+        "climate_emotions_map.app:server",
+    ]
+    if preload:
+        command.insert(-1, "--preload")
+    print(f"Starting the server: {' '.join(command[2:])}")
+    process = subprocess.Popen(command, cwd=REPO_DIR)
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < startup_timeout:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"The server exited with code {process.returncode}"
+            )
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{port}/_dash-layout", timeout=timeout
+            ):
+                print(
+                    f"The server started in {time.perf_counter() - start:.1f} s"
+                )
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(
+        f"The server did not respond within {startup_timeout} s of being started. "
+        "Loading the data and building the layout can take about a minute with the full data (more with --preload "
+        "or many workers on few cores), so try a larger --startup-timeout."
+    )
+
+
+def simulate_user(
+    url: str,
+    seed: int,
+    end_time: float,
+    accept_gzip: bool,
+    timeout: float,
+    lock: threading.Lock,
+    records: list[dict],
+    sessions: dict,
+):
+    """Replay sessions as one user until the end time, recording why each failed session failed."""
+    rng = random.Random(seed)
+    while time.perf_counter() < end_time:
+        client = None
+        failure = None
+        try:
+            client = CallbackClient(
+                HTTPTransport(url, accept_gzip=accept_gzip, timeout=timeout)
+            )
+            # The names of the callback functions are not available from outside the server
+            client.callback_names = {
+                dependency["output"]: f"{first_input_id} callback"
+                for first_input_id, dependency in client.callbacks.items()
+            }
+            Session(client, rng).run()
+        except Exception as exception:
+            # e.g., the page failed to load or a response is not what the browser would expect
+            failure = {
+                "type": type(exception).__name__,
+                "message": str(exception),
+            }
+        with lock:
+            if client is not None:
+                records.extend(client.records)
+            if failure is None:
+                sessions["completed"] += 1
+            else:
+                sessions["failed"] += 1
+                sessions["failures"].append(failure)
+
+
+def run_load_test(
+    url: str,
+    users: int,
+    duration: float,
+    accept_gzip: bool,
+    timeout: float,
+    seed: int,
+) -> dict:
+    """Simulate concurrent users for a duration and return the recorded requests and session counts."""
+    lock = threading.Lock()
+    records = []
+    sessions = {"completed": 0, "failed": 0, "failures": []}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        for user in range(users):
+            executor.submit(
+                simulate_user,
+                url=url,
+                seed=seed + user,
+                end_time=start + duration,
+                accept_gzip=accept_gzip,
+                timeout=timeout,
+                lock=lock,
+                records=records,
+                sessions=sessions,
+            )
+    # Sessions in progress at the end time are finished, so the test can run a little longer
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "sessions": sessions, "records": records}
+
+
+def summarize_load_test(results: dict) -> dict:
+    """Return the overall throughput, latency percentiles and error rate of a load test."""
+    records = results["records"]
+    latencies = [
+        record["latency_ms"]
+        for record in records
+        if record["latency_ms"] is not None
+    ]
+    errors = sum(record["error"] for record in records)
+    # The HTTP status or exception of the failed requests, and the exception that ended each failed session
+    request_errors = Counter(
+        record["error_type"] for record in records if record["error"]
+    )
+    session_failures = Counter(
+        failure["type"] for failure in results["sessions"]["failures"]
+    )
+    return {
+        "elapsed_s": results["elapsed_s"],
+        "requests": len(records),
+        "requests_per_s": len(records) / results["elapsed_s"],
+        "sessions_completed": results["sessions"]["completed"],
+        "sessions_failed": results["sessions"]["failed"],
+        "sessions_per_min": results["sessions"]["completed"]
+        / results["elapsed_s"]
+        * 60,
+        "errors": errors,
+        "error_rate": errors / len(records) if records else None,
+        "request_errors": dict(request_errors.most_common()),
+        "session_failures": dict(session_failures.most_common()),
+        "p50_ms": get_percentile(latencies, 50),
+        "p95_ms": get_percentile(latencies, 95),
+        "p99_ms": get_percentile(latencies, 99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--url",
+        type=str,
+        default=None,
+        help="URL of an already running server to test (default: start one locally with gunicorn)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of gunicorn workers (default: 1)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of threads per gunicorn worker (default: 1)",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load the app before forking the gunicorn workers",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=4,
+        help="Number of concurrent simulated users (default: 4)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=30,
+        help="Duration of the test in seconds (default: 30)",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Accept gzip-compressed responses, like a browser",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Timeout in seconds for each request (default: 60)",
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=600,
+        help="Timeout in seconds for the server to start responding, which includes importing the app (default: 600)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the random choices of the first user (incremented for each other user) (default: 0)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the summaries to",
+    )
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        port = get_free_port()
+        process = start_server(
+            port,
+            workers=args.workers,
+            threads=args.threads,
+            preload=args.preload,
+            startup_timeout=args.startup_timeout,
+            timeout=args.timeout,
+        )
+        url = f"http://127.0.0.1:{port}"
+
+    try:
+        results = run_load_test(
+            url,
+            users=args.users,
+            duration=args.duration,
+            accept_gzip=args.gzip,
+            timeout=args.timeout,
+            seed=args.seed,
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = summarize_load_test(results)
+    callback_summary = summarize_records(results["records"])
+    server_description = (
+        args.url or f"{args.workers} workers x {args.threads} threads"
+    )
+    print(
+        f"\n{args.users} users for {summary['elapsed_s']:.1f} s ({server_description}):"
+    )
+    print(
+        f"  {summary['requests']} requests ({summary['requests_per_s']:.1f}/s), "
+        f"{summary['sessions_completed']} sessions completed ({summary['sessions_per_min']:.1f}/min), "
+        f"{summary['sessions_failed']} failed"
+    )
+    if summary["requests"]:
+        print(
+            f"  latency p50/p95/p99: {summary['p50_ms']:.1f}/{summary['p95_ms']:.1f}/{summary['p99_ms']:.1f} ms, "
+            f"error rate: {summary['error_rate']:.2%}\n"
+        )
+        print_summary(callback_summary)
+    for title, counts in [
+        ("Request errors", summary["request_errors"]),
+        ("Session failures", summary["session_failures"]),
+    ]:
+        if counts:
+            print(f"\n{title}:")
+            for error_type, count in counts.items():
+                print(f"  {count:>6} {error_type}")
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "config": vars(args) | {"url": url},
+                    "summary": summary,
+                    "callbacks": callback_summary,
+                    "session_failures": results["sessions"]["failures"],
+                },
+                indent=2,
+                default=str,
+            )
+        )
+        print(f"Wrote the results to {args.output}")
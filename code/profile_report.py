@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Aggregate the .pstats files dumped by the profiling hook of the app into a ranked report of the hottest functions.
+
+The profiles are grouped by callback (from the file names, see climate_emotions_map/profiling.py),
+and the functions are ranked by cumulative or own time summed over all the profiles of a callback.
+The aggregated profiles can also be written out, e.g. to be explored with snakeviz.
+
+Example usage:
+    python code/profile_report.py profiles
+    python code/profile_report.py profiles --callback update_selection_dependent_outputs --sort tottime --top 30
+    python code/profile_report.py profiles --restrict make_ --output-dir profiles/aggregated
+"""
+
+import argparse
+import io
+import pstats
+from collections import defaultdict
+from pathlib import Path
+
+
+def get_callback_from_path(path: Path) -> str:
+    """Return the callback name of a profile file named <callback>-<timestamp>-<pid>.pstats."""
+    return path.stem.rsplit("-", 2)[0]
+
+
+def find_profiles(paths: list[Path]) -> dict[str, list[Path]]:
+    """Find the .pstats files in the given files/directories and group them by callback."""
+    profiles = defaultdict(list)
+    for path in paths:
+        files = sorted(path.glob("*.pstats")) if path.is_dir() else [path]
+        for file in files:
+            profiles[get_callback_from_path(file)].append(file)
+    return dict(sorted(profiles.items()))
+
+
+def aggregate_profiles(files: list[Path]) -> pstats.Stats:
+    """Sum the statistics of several profiles."""
+    stats = pstats.Stats(str(files[0]), stream=io.StringIO())
+    for file in files[1:]:
+        stats.add(str(file))
+    return stats
+
+
+def format_report(
+    callback: str,
+    stats: pstats.Stats,
+    n_profiles: int,
+    sort: str,
+    top: int,
+    restrict: str | None,
+) -> str:
+    """Return the hottest functions of the aggregated profiles of a callback."""
+    stream = io.StringIO()
+    stats.stream = stream
+    # Do not list every profile file in the report
+    stats.files = []
+    stats.strip_dirs().sort_stats(sort)
+    restrictions = [top] if restrict is None else [restrict, top]
+    stats.print_stats(*restrictions)
+    mean_time_ms = stats.total_tt / n_profiles * 1000
+    header = (
+        f"{callback}: {n_profiles} profiles, {mean_time_ms:.1f} ms per request"
+    )
+    return f"{header}\n{'=' * len(header)}\n{stream.getvalue()}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "paths",
+        type=Path,
+        nargs="+",
+        help=".pstats files or directories containing them",
+    )
+    parser.add_argument(
+        "--callback",
+        type=str,
+        action="append",
+        default=None,
+        help="Only report on this callback (can be repeated)",
+    )
+    parser.add_argument(
+        "--combine",
+        action="store_true",
+        help="Aggregate the profiles of all callbacks into a single report",
+    )
+    parser.add_argument(
+        "--sort",
+        type=str,
+        choices=["cumulative", "tottime", "ncalls"],
+        default="cumulative",
+        help="How to rank the functions (default: cumulative)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Number of functions to report for each callback (default: 20)",
+    )
+    parser.add_argument(
+        "--restrict",
+        type=str,
+        default=None,
+        help="Only report on the functions whose file:line(name) matches this regular expression (without directories)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Directory to write the aggregated profile of each callback to",
+    )
+    args = parser.parse_args()
+
+    profiles = find_profiles(args.paths)
+    if args.callback is not None:
+        profiles = {
+            callback: files
+            for callback, files in profiles.items()
+            if callback in args.callback
+        }
+    if args.combine:
+        profiles = {
+            "all callbacks": [
+                file for files in profiles.values() for file in files
+            ]
+        }
+    if not any(profiles.values()):
+        parser.error(f"No profiles found in {', '.join(map(str, args.paths))}")
+
+    for callback, files in profiles.items():
+        stats = aggregate_profiles(files)
+        if args.output_dir is not None:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+            output_file = (
+                args.output_dir / f"{callback.replace(' ', '_')}.pstats"
+            )
+            stats.dump_stats(output_file)
+            print(f"Wrote the aggregated profile to {output_file}")
+        print(
+            format_report(
+                callback,
+                stats,
+                n_profiles=len(files),
+                sort=args.sort,
+                top=args.top,
+                restrict=args.restrict,
+            )
+        )
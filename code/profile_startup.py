@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+"""
+Break down the startup time of the app (i.e. what a gunicorn worker does when it boots) into phases,
+and check it against a time and memory budget.
+
+The phases are, in order:
+- the imports of the main libraries (pandas, plotly, dash, etc.),
+- each global of data_loader (survey data, data dictionaries, GeoJSON objects, prerendered figures),
+- the imports of the figure and layout modules,
+- each top-level statement of app, with the layout functions (create_*, construct_layout)
+  and the figure builders they call (make_map, make_stacked_bar, make_descriptive_plots) timed separately.
+
+The peak RSS of the process is reported after each phase. This script has to be run in a fresh process
+(it is not meant to be imported), so that nothing is imported before it is timed.
+
+A budget can be given as a JSON file with the maximum total startup time in seconds, the maximum peak RSS in MB
+and/or the maximum time in seconds of any phase (named by their path in the report), e.g.:
+    {"total_s": 20, "peak_rss_mb": 1500, "phases": {"library imports": 5, "app/app.layout": 8}}
+The script exits with an error if the budget is exceeded.
+
+Example usage:
+    python code/profile_startup.py
+    python code/profile_startup.py --min-ms 10 --output startup.json
+    python code/profile_startup.py --budget startup_budget.json
+    python code/profile_startup.py --max-total-s 20 --max-peak-rss-mb 1500
+"""
+
+import argparse
+import ast
+import functools
+import importlib
+import importlib.util
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+PACKAGE = "climate_emotions_map"
+
+LIBRARIES = [
+    "numpy",
+    "pandas",
+    "plotly.graph_objects",
+    "plotly.express",
+    "flask",
+    "dash",
+    "dash_mantine_components",
+    "prometheus_client",
+]
+FIGURE_MODULES = [
+    "make_map",
+    "make_stacked_bar_plots",
+    "make_descriptive_plots",
+    "layout",
+]
+# Functions of the layout module that are timed separately when building the layout
+LAYOUT_FUNCTIONS = {"make_map", "make_stacked_bar", "make_descriptive_plots"}
+LAYOUT_FUNCTION_PREFIXES = ("create_", "construct_", "get_")
+
+MAX_STATEMENT_NAME_LENGTH = 60
+
+
+def get_peak_rss_mb() -> float:
+    """Return the peak resident set size of the process so far, in MB."""
+    # NOTE: ru_maxrss is in kB on Linux (but in bytes on macOS)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss /= 1024
+    return peak_rss / 1024
+
+
+class StartupProfiler:
+    """Record the duration, number of calls and peak RSS of nested phases."""
+
+    def __init__(self):
+        self.phases = {}
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed code as a phase, nested in the phase in progress (if any)."""
+        path = "/".join([*self._stack, name])
+        # The phase is added before its children, so that the phases are listed in order
+        phase = self.phases.setdefault(
+            path,
+            {
+                "name": name,
+                "depth": len(self._stack),
+                "calls": 0,
+                "duration_s": 0,
+            },
+        )
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_s = time.perf_counter() - start
+            self._stack.pop()
+            phase["calls"] += 1
+            phase["duration_s"] += duration_s
+            phase["peak_rss_mb"] = get_peak_rss_mb()
+
+    def wrap(self, func, name: str):
+        """Return a version of a function whose calls are timed as phases."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def get_total_s(self) -> float:
+        """Return the total duration of the top-level phases."""
+        return sum(
+            phase["duration_s"]
+            for phase in self.phases.values()
+            if phase["depth"] == 0
+        )
+
+
+def get_statement_name(statement: ast.stmt) -> str:
+    """Return a short name for a top-level statement of a module (e.g., the name of the global it assigns)."""
+    if isinstance(statement, (ast.Assign, ast.AnnAssign)):
+        targets = (
+            statement.targets
+            if isinstance(statement, ast.Assign)
+            else [statement.target]
+        )
+        name = ", ".join(ast.unparse(target) for target in targets)
+    elif isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+        name = f"def {statement.name}"
+    elif isinstance(statement, ast.If):
+        name = f"if {ast.unparse(statement.test)}"
+    else:
+        name = ast.unparse(statement).splitlines()[0]
+    if len(name) > MAX_STATEMENT_NAME_LENGTH:
+        name = f"{name[:MAX_STATEMENT_NAME_LENGTH - 3]}..."
+    return name
+
+
+def exec_module_by_statement(profiler: StartupProfiler, module_name: str):
+    """Import a module by running its top-level statements one at a time, timing each of them as a phase."""
+    spec = importlib.util.find_spec(module_name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    parent_name, _, child_name = module_name.rpartition(".")
+    setattr(sys.modules[parent_name], child_name, module)
+
+    tree = ast.parse(Path(spec.origin).read_text(), filename=spec.origin)
+    for statement in tree.body:
+        code = compile(
+            ast.Module(body=[statement], type_ignores=[]), spec.origin, "exec"
+        )
+        with profiler.phase(get_statement_name(statement)):
+            exec(code, module.__dict__)
+    return module
+
+
+def time_layout_functions(profiler: StartupProfiler, layout_module):
+    """Time the calls of the functions that build the layout (and of the figure builders they call)."""
+    for name, obj in list(vars(layout_module).items()):
+        if callable(obj) and (
+            name in LAYOUT_FUNCTIONS
+            or (
+                name.startswith(LAYOUT_FUNCTION_PREFIXES)
+                and getattr(obj, "__module__", None) == layout_module.__name__
+            )
+        ):
+            setattr(layout_module, name, profiler.wrap(obj, name))
+
+
+def profile_startup() -> StartupProfiler:
+    """Start the app as a gunicorn worker would, timing each phase."""
+    profiler = StartupProfiler()
+
+    with profiler.phase("library imports"):
+        for library in LIBRARIES:
+            with profiler.phase(library):
+                importlib.import_module(library)
+
+    importlib.import_module(PACKAGE)
+    with profiler.phase("data_loader"):
+        exec_module_by_statement(profiler, f"{PACKAGE}.data_loader")
+
+    with profiler.phase("figure modules"):
+        for module_name in FIGURE_MODULES:
+            with profiler.phase(module_name):
+                importlib.import_module(f"{PACKAGE}.{module_name}")
+    time_layout_functions(profiler, sys.modules[f"{PACKAGE}.layout"])
+
+    with profiler.phase("app"):
+        exec_module_by_statement(profiler, f"{PACKAGE}.app")
+
+    return profiler
+
+
+def check_budget(
+    profiler: StartupProfiler, peak_rss_mb: float, budget: dict
+) -> list[str]:
+    """Return a description of each way in which the startup exceeds the budget."""
+    violations = []
+    total_s = profiler.get_total_s()
+    if "total_s" in budget and total_s > budget["total_s"]:
+        violations.append(
+            f"total startup time {total_s:.2f} s > {budget['total_s']} s"
+        )
+    if "peak_rss_mb" in budget and peak_rss_mb > budget["peak_rss_mb"]:
+        violations.append(
+            f"peak RSS {peak_rss_mb:.0f} MB > {budget['peak_rss_mb']} MB"
+        )
+    for path, max_s in budget.get("phases", {}).items():
+        if path not in profiler.phases:
+            violations.append(f"unknown phase {path!r} in the budget")
+        elif profiler.phases[path]["duration_s"] > max_s:
+            violations.append(
+                f"phase {path!r} took {profiler.phases[path]['duration_s']:.2f} s > {max_s} s"
+            )
+    return violations
+
+
+def print_report(profiler: StartupProfiler, min_ms: float):
+    """Print the phases that took at least min_ms, as a tree."""
+    total_s = profiler.get_total_s()
+    name_width = max(
+        len("  " * phase["depth"] + phase["name"])
+        for phase in profiler.phases.values()
+    )
+    print(
+        f"\n{'phase':<{name_width}} {'calls':>6} {'time (s)':>9} {'% total':>8} {'peak RSS (MB)':>14}"
+    )
+    for phase in profiler.phases.values():
+        if phase["duration_s"] * 1000 < min_ms:
+            continue
+        name = "  " * phase["depth"] + phase["name"]
+        print(
+            f"{name:<{name_width}} {phase['calls']:>6} {phase['duration_s']:>9.3f} "
+            f"{phase['duration_s'] / total_s:>8.1%} {phase['peak_rss_mb']:>14.0f}"
+        )
+    print(f"\nTotal: {total_s:.2f} s, peak RSS: {get_peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=1,
+        help="Only report the phases that took at least this long, in ms (default: 1)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=Path,
+        default=None,
+        help="JSON file with the startup budget (see above)",
+    )
+    parser.add_argument(
+        "--max-total-s",
+        type=float,
+        default=None,
+        help="Maximum total startup time in seconds (overrides the budget file)",
+    )
+    parser.add_argument(
+        "--max-peak-rss-mb",
+        type=float,
+        default=None,
+        help="Maximum peak RSS in MB (overrides the budget file)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the phases to",
+    )
+    args = parser.parse_args()
+
+    # Hacky hacky gets the job done for importing the app
+    sys.path.append(str(Path(__file__).parent.parent))
+
+    profiler = profile_startup()
+    peak_rss_mb = get_peak_rss_mb()
+    print_report(profiler, min_ms=args.min_ms)
+
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "total_s": profiler.get_total_s(),
+                    "peak_rss_mb": peak_rss_mb,
+                    "phases": profiler.phases,
+                },
+                indent=2,
+            )
+        )
+        print(f"Wrote the phases to {args.output}")
+
+    budget = {} if args.budget is None else json.loads(args.budget.read_text())
+    if args.max_total_s is not None:
+        budget["total_s"] = args.max_total_s
+    if args.max_peak_rss_mb is not None:
+        budget["peak_rss_mb"] = args.max_peak_rss_mb
+    if budget:
+        violations = check_budget(profiler, peak_rss_mb, budget)
+        if violations:
+            sys.exit(
+                "Startup budget exceeded:\n"
+                + "\n".join(f"  - {violation}" for violation in violations)
+            )
+        print("Startup is within budget")